@@ -0,0 +1,80 @@
+"""
+Micro-benchmark of the page preprocessing steps in doc_ai.utils.page_preprocessing.
+
+Reports pages per second for every step on either synthetic A4 pages or the pages
+of a real PDF:
+
+    python -m benchmarks.page_preprocessing
+    python -m benchmarks.page_preprocessing --pdf scan.pdf --dpi 300
+"""
+import argparse
+import time
+import numpy as np
+from PIL import Image
+from doc_ai.utils import page_preprocessing as pp
+
+
+def synthetic_pages(count: int, dpi: int) -> list:
+    """Creates grey A4 pages with paper noise and dark 'text lines'."""
+    rng = np.random.default_rng(0)
+    width, height = int(8.27 * dpi), int(11.69 * dpi)
+    pages = []
+    for _ in range(count):
+        page = rng.normal(225, 12, (height, width))
+        for top in range(dpi, height - dpi, dpi // 6):
+            page[top:top + dpi // 20, dpi:width - dpi] -= 150
+        pages.append(Image.fromarray(page.clip(0, 255).astype(np.uint8)))
+    return pages
+
+
+def pdf_pages(file_path: str, dpi: int) -> list:
+    from pdf2image import convert_from_path
+    return convert_from_path(file_path, dpi=dpi)
+
+
+def legacy_binarize(page: Image.Image) -> bytes:
+    """The per-pixel lambda thresholding that pdf_to_img used before page_preprocessing."""
+    from io import BytesIO
+    image_binary = page.convert('L').point(lambda x: 0 if x < 128 else 255, '1')
+    buffer = BytesIO()
+    image_binary.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def measure(name: str, func, inputs: list, repeat: int) -> list:
+    outputs = []
+    start = time.perf_counter()
+    for _ in range(repeat):
+        outputs = [func(item) for item in inputs]
+    elapsed = time.perf_counter() - start
+    pages = len(inputs) * repeat
+    print(f"{name:<28} {pages / elapsed:10.1f} pages/s   {1000 * elapsed / pages:8.2f} ms/page")
+    return outputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", help="Benchmark the pages of this PDF instead of synthetic pages.")
+    parser.add_argument("--pages", type=int, default=5, help="Number of synthetic pages.")
+    parser.add_argument("--dpi", type=int, default=200, help="Rendering resolution of the pages.")
+    parser.add_argument("--target-dpi", type=int, default=150, help="Resolution for the downsampling step.")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of passes over the pages per step.")
+    args = parser.parse_args()
+
+    pages = pdf_pages(args.pdf, args.dpi) if args.pdf else synthetic_pages(args.pages, args.dpi)
+    print(f"{len(pages)} pages of {pages[0].width}x{pages[0].height} px at {args.dpi} DPI, {args.repeat} passes\n")
+
+    gray = measure("to_gray_array", pp.to_gray_array, pages, args.repeat)
+    measure(f"downsample_to_dpi ({args.target_dpi})", lambda g: pp.downsample_to_dpi(g, args.dpi, args.target_dpi), gray, args.repeat)
+    binary = measure("global_threshold", pp.global_threshold, gray, args.repeat)
+    measure("otsu_threshold", pp.otsu_threshold, gray, args.repeat)
+    measure("adaptive_threshold", pp.adaptive_threshold, gray, args.repeat)
+    measure("encode_png (1-bit)", lambda b: pp.encode_png(b, binary=True), binary, args.repeat)
+    measure("encode_jpeg (gray)", pp.encode_jpeg, gray, args.repeat)
+    print()
+    measure("legacy point() + PNG", legacy_binarize, pages, args.repeat)
+    measure("preprocess_page + PNG", lambda page: pp.encode_png(pp.preprocess_page(page), binary=True), pages, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
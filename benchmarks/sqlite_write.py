@@ -0,0 +1,133 @@
+"""
+Benchmark of the SQLite write path in doc_ai.clients.sqlite_client.
+
+Inserts the same synthetic documents into a fresh database file for every
+configuration and reports documents per second:
+
+    python -m benchmarks.sqlite_write
+    python -m benchmarks.sqlite_write --documents 5000 --workers 8 --text-kb 20
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime
+from doc_ai.clients.sqlite_client import DocumentDatabase, GroupCommitWriter, DEFAULT_PRAGMAS
+from doc_ai.configs.models import Document
+
+# The rollback journal with full fsync, i.e. SQLite's defaults before tuning
+LEGACY_PRAGMAS = {"journal_mode": "DELETE", "synchronous": "FULL"}
+
+
+def synthetic_documents(count: int, text_kb: int) -> list:
+    text = ("Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * (text_kb * 18))[:text_kb * 1024]
+    return [
+        Document(
+            uuid=str(uuid.uuid4()),
+            title=f"Document {i}",
+            text=text,
+            summary="A synthetic document.",
+            text_orig=text,
+            category="Other",
+            tags=["benchmark", f"tag{i % 10}"],
+            timestamp=datetime(2024, 1, 1 + i % 28),
+            langs=["en"],
+            filepath=f"Other/document_{i}",
+            filepath_orig=f"/tmp/document_{i}.pdf",
+            content_hash=uuid.uuid4().hex,
+        )
+        for i in range(count)
+    ]
+
+
+def open_database(directory: str, name: str, pragmas: dict) -> DocumentDatabase:
+    # DocumentDatabase is a singleton; drop the previous instance to start from a fresh file
+    DocumentDatabase._instance = None
+    db = DocumentDatabase(os.path.join(directory, f"{name}.db"), pragmas)
+    db.create_table()
+    return db
+
+
+def run_threads(workers: int, documents: list, insert):
+    def work(offset: int):
+        for document in documents[offset::workers]:
+            insert(document)
+
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def measure(name: str, func, count: int):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<40} {count / elapsed:10.1f} docs/s   {1000 * elapsed / count:8.3f} ms/doc")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=2000, help="Number of documents per configuration.")
+    parser.add_argument("--text-kb", type=int, default=8, help="Size of the text fields of every document.")
+    parser.add_argument("--workers", type=int, default=4, help="Number of concurrent writer threads.")
+    parser.add_argument("--batch", type=int, default=64, help="Batch size for add_documents and group commit.")
+    parser.add_argument("--delay-ms", type=float, default=0, help="Maximum wait of the group commit writer.")
+    args = parser.parse_args()
+
+    print(f"{args.documents} documents of ~{2 * args.text_kb} KB, {args.workers} writer threads\n")
+
+    with tempfile.TemporaryDirectory() as directory:
+        def documents():
+            # Fresh uuids for every run, the vdb_uuid column is unique
+            return synthetic_documents(args.documents, args.text_kb)
+
+        docs = documents()
+        db = open_database(directory, "legacy", LEGACY_PRAGMAS)
+        measure("add_document, rollback journal", lambda: [db.add_document(d) for d in docs], len(docs))
+
+        docs = documents()
+        db = open_database(directory, "wal", DEFAULT_PRAGMAS)
+        measure("add_document, WAL + pragmas", lambda: [db.add_document(d) for d in docs], len(docs))
+
+        docs = documents()
+        db = open_database(directory, "wal_threads", DEFAULT_PRAGMAS)
+        measure(f"add_document, WAL, {args.workers} threads",
+                lambda: run_threads(args.workers, docs, db.add_document), len(docs))
+
+        docs = documents()
+        db = open_database(directory, "batch", DEFAULT_PRAGMAS)
+        measure(f"add_documents, WAL, batches of {args.batch}",
+                lambda: [db.add_documents(docs[i:i + args.batch]) for i in range(0, len(docs), args.batch)],
+                len(docs))
+
+        docs = documents()
+        db = open_database(directory, "group", DEFAULT_PRAGMAS)
+        writer = GroupCommitWriter(db, max_rows=args.batch, max_delay_ms=args.delay_ms)
+        measure(f"GroupCommitWriter, WAL, {args.workers} threads",
+                lambda: run_threads(args.workers, docs, writer.add_document), len(docs))
+        writer.close()
+
+        # Group commit matters most when every commit is fsynced
+        print()
+        durable = {**DEFAULT_PRAGMAS, "synchronous": "FULL"}
+        docs = documents()
+        db = open_database(directory, "durable_threads", durable)
+        measure(f"add_document, WAL FULL, {args.workers} threads",
+                lambda: run_threads(args.workers, docs, db.add_document), len(docs))
+
+        docs = documents()
+        db = open_database(directory, "durable_group", durable)
+        writer = GroupCommitWriter(db, max_rows=args.batch, max_delay_ms=args.delay_ms)
+        measure(f"GroupCommitWriter, WAL FULL, {args.workers} threads",
+                lambda: run_threads(args.workers, docs, writer.add_document), len(docs))
+        writer.close()
+
+    DocumentDatabase._instance = None
+
+
+if __name__ == "__main__":
+    main()
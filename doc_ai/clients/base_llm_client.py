@@ -1,9 +1,12 @@
+import asyncio
 import logging
 from abc import ABC, abstractmethod
 from typing import Any
 from langchain.prompts import PromptTemplate
 from langchain.output_parsers import PydanticOutputParser
 from doc_ai.configs.models import DocumentRaw
+from doc_ai.clients.rate_limiter import LlmRateLimiter, estimate_tokens, IMAGE_TOKEN_ESTIMATE
+from doc_ai.clients.llm_cache import LlmCache
 import base64
 from mimetypes import guess_type
 from doc_ai.configs.prompts import IMG_PROMPT
@@ -23,8 +26,15 @@ class BaseLlm(ABC):
     language learning models (LLMs) for processing input data, images, and generating outputs or responses.
     """
 
-    def __init__(self):
+    def __init__(self, rate_limiter: LlmRateLimiter = None, cache: LlmCache = None):
+        """
+        :param rate_limiter: Limiter shared by all requests of this client (and optionally other clients).
+            Defaults to a limiter that only caps concurrency.
+        :param cache: Optional cache of parsed responses for invoke_img and invoke_llm.
+        """
         logger.info("Initializing BaseLlm class.")
+        self.rate_limiter = rate_limiter or LlmRateLimiter()
+        self.cache = cache
         self.llm = self.connect()
 
     @abstractmethod
@@ -62,25 +72,37 @@ class BaseLlm(ABC):
         encoded_image = self.local_image_to_data_url(image_path)
         return self.invoke_img(encoded_image)
 
-    def invoke_img(self, encoded_image):
-        logger.info("Invoking LLM with encoded image.")
-        try:
-            prompt_template = HumanMessagePromptTemplate.from_template(
-                template=[
-                    {"type": "text", "text": IMG_PROMPT},
-                    {"type": "text", "text": "{format_instructions}"},
-                    {"type": "image_url", "image_url": "{encoded_image}"},
-                ]
-            )
+    def _img_chain(self, encoded_image):
+        """Builds the image extraction chain and its input."""
+        prompt_template = HumanMessagePromptTemplate.from_template(
+            template=[
+                {"type": "text", "text": IMG_PROMPT},
+                {"type": "text", "text": "{format_instructions}"},
+                {"type": "image_url", "image_url": "{encoded_image}"},
+            ]
+        )
 
-            prompt = ChatPromptTemplate.from_messages([prompt_template])
-            parser = PydanticOutputParser(pydantic_object=DocumentRaw)
+        prompt = ChatPromptTemplate.from_messages([prompt_template])
+        parser = PydanticOutputParser(pydantic_object=DocumentRaw)
 
-            image_chain = prompt | self.llm | parser
+        image_chain = prompt | self.llm | parser
+
+        format_instructions = parser.get_format_instructions()
+        return image_chain, {"encoded_image": encoded_image, "format_instructions": format_instructions}
+
+    def invoke_img(self, encoded_image):
+        logger.info("Invoking LLM with encoded image.")
+        cache_key = self._cache_key(IMG_PROMPT + encoded_image, DocumentRaw)
+        cached = self._cache_get(cache_key, DocumentRaw)
+        if cached is not None:
+            return cached
 
-            format_instructions = parser.get_format_instructions()
-            response = image_chain.invoke(input={"encoded_image": encoded_image, "format_instructions": format_instructions})
+        try:
+            image_chain, chain_input = self._img_chain(encoded_image)
+            with self.rate_limiter.limit(IMAGE_TOKEN_ESTIMATE):
+                response = image_chain.invoke(input=chain_input)
             logger.info("Image processing successful.")
+            self._cache_set(cache_key, response)
 
             return response
         except Exception as e:
@@ -89,10 +111,19 @@ class BaseLlm(ABC):
 
     def invoke_llm(self, prompt: Any, document_text: str, parser: Any):
         logger.info("Invoking LLM with prompt and document text.")
+        rendered_prompt = self._render_prompt(prompt, document_text)
+        model_cls = getattr(parser, "pydantic_object", None)
+        cache_key = self._cache_key(rendered_prompt, model_cls)
+        cached = self._cache_get(cache_key, model_cls)
+        if cached is not None:
+            return cached
+
         try:
             table_chain = prompt | self.llm | parser
-            response = table_chain.invoke({"document_text": document_text})
+            with self.rate_limiter.limit(estimate_tokens(rendered_prompt or document_text)):
+                response = table_chain.invoke({"document_text": document_text})
             logger.info("LLM invocation successful.")
+            self._cache_set(cache_key, response)
 
             return response
         except Exception as e:
@@ -109,10 +140,136 @@ class BaseLlm(ABC):
             )
 
             table_chain = prompt | self.llm
-            response = table_chain.invoke({"user_query": user_prompt})
+            with self.rate_limiter.limit(estimate_tokens(template) + estimate_tokens(document) + estimate_tokens(user_prompt)):
+                response = table_chain.invoke({"user_query": user_prompt})
             logger.info("Document summarization successful.")
 
             return response
         except Exception as e:
             logger.error("Error during document summarization: %s", e)
             raise
+
+    # ------------------------------------------------------------------------
+    # Async API
+    # ------------------------------------------------------------------------
+    async def ainvoke_img_from_binary(self, image_binary, mime_type='image/png'):
+        logger.info("Encoding image from binary data.")
+        encoded_image = self.image_binary_to_data_url(image_binary, mime_type)
+        return await self.ainvoke_img(encoded_image)
+
+    async def ainvoke_img_from_path(self, image_path):
+        logger.info("Encoding image from path: %s", image_path)
+        encoded_image = await asyncio.to_thread(self.local_image_to_data_url, image_path)
+        return await self.ainvoke_img(encoded_image)
+
+    async def ainvoke_img(self, encoded_image):
+        logger.info("Invoking LLM with encoded image (async).")
+        cache_key = self._cache_key(IMG_PROMPT + encoded_image, DocumentRaw)
+        cached = await self._acache_get(cache_key, DocumentRaw)
+        if cached is not None:
+            return cached
+
+        try:
+            image_chain, chain_input = self._img_chain(encoded_image)
+            async with self.rate_limiter.alimit(IMAGE_TOKEN_ESTIMATE):
+                response = await image_chain.ainvoke(input=chain_input)
+            logger.info("Image processing successful.")
+            await self._acache_set(cache_key, response)
+
+            return response
+        except Exception as e:
+            logger.error("Error during image processing: %s", e)
+            raise
+
+    async def ainvoke_llm(self, prompt: Any, document_text: str, parser: Any):
+        logger.info("Invoking LLM with prompt and document text (async).")
+        rendered_prompt = self._render_prompt(prompt, document_text)
+        model_cls = getattr(parser, "pydantic_object", None)
+        cache_key = self._cache_key(rendered_prompt, model_cls)
+        cached = await self._acache_get(cache_key, model_cls)
+        if cached is not None:
+            return cached
+
+        try:
+            table_chain = prompt | self.llm | parser
+            async with self.rate_limiter.alimit(estimate_tokens(rendered_prompt or document_text)):
+                response = await table_chain.ainvoke({"document_text": document_text})
+            logger.info("LLM invocation successful.")
+            await self._acache_set(cache_key, response)
+
+            return response
+        except Exception as e:
+            logger.error("Error during LLM invocation: %s", e)
+            raise
+
+    async def allm_summ_docs(self, template, user_prompt: str, document: str):
+        logger.info("Summarizing document using LLM (async).")
+        try:
+            prompt = PromptTemplate(
+                template=template,
+                input_variables=["user_query"],
+                partial_variables={"document": document},
+            )
+
+            table_chain = prompt | self.llm
+            async with self.rate_limiter.alimit(estimate_tokens(template) + estimate_tokens(document) + estimate_tokens(user_prompt)):
+                response = await table_chain.ainvoke({"user_query": user_prompt})
+            logger.info("Document summarization successful.")
+
+            return response
+        except Exception as e:
+            logger.error("Error during document summarization: %s", e)
+            raise
+
+    @staticmethod
+    def _render_prompt(prompt: Any, document_text: str) -> str | None:
+        try:
+            return prompt.format(document_text=document_text)
+        except Exception:
+            return None
+
+    # ------------------------------------------------------------------------
+    # Response cache
+    # ------------------------------------------------------------------------
+    @property
+    def model_id(self) -> str:
+        return getattr(self.llm, "model_id", None) or getattr(self.llm, "model_name", None) or type(self.llm).__name__
+
+    def _cache_key(self, prompt: str, model_cls) -> str | None:
+        # Only responses parsed into a Pydantic model can be restored from the cache
+        if self.cache is None or model_cls is None or prompt is None:
+            return None
+        return LlmCache.make_key(self.model_id, prompt, LlmCache.schema_of(model_cls))
+
+    def _cache_get(self, cache_key: str | None, model_cls):
+        # Read once, close() may clear it meanwhile
+        cache = self.cache
+        if cache_key is None or cache is None:
+            return None
+        response = cache.get(cache_key, model_cls)
+        if response is not None:
+            logger.info("LLM response served from cache.")
+        return response
+
+    def _cache_set(self, cache_key: str | None, response):
+        cache = self.cache
+        if cache_key is not None and response is not None and cache is not None:
+            cache.set(cache_key, response)
+
+    # The cache is SQLite, so the async variants run it off the event loop
+    async def _acache_get(self, cache_key: str | None, model_cls):
+        if cache_key is None:
+            return None
+        return await asyncio.to_thread(self._cache_get, cache_key, model_cls)
+
+    async def _acache_set(self, cache_key: str | None, response):
+        if cache_key is not None and response is not None:
+            await asyncio.to_thread(self._cache_set, cache_key, response)
+
+    def close(self):
+        """
+        Closes the response cache. Requests made afterwards are not cached.
+        """
+        if self.cache is not None:
+            self.cache.close()
+            self.cache = None
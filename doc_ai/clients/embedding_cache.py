@@ -0,0 +1,175 @@
+import hashlib
+import logging
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from typing import List
+from langchain_core.embeddings import Embeddings
+from doc_ai.clients.hashing_embeddings import HashingEmbeddings
+
+logger = logging.getLogger(__name__)
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an embeddings model and stores every computed vector in SQLite, keyed by the
+    hash of the embedded text and the model name, so an identical text is embedded only
+    once across re-indexing runs.
+
+    embed_documents looks all texts up in one query and sends the misses to the model
+    in batches of `batch_size`. Query vectors are additionally kept in an in-memory
+    LRU, so repeated searches skip even the database lookup.
+    """
+
+    def __init__(self, embeddings: Embeddings, model_name: str, db_path: str = ":memory:", batch_size: int = 32,
+                 query_cache_size: int = 256):
+        """
+        :param embeddings: The embeddings model that computes missing vectors.
+        :param model_name: Name of the model, part of the cache key.
+        :param db_path: Path to the SQLite file holding the vectors (in memory if not given).
+        :param batch_size: Number of texts sent to the model per call.
+        :param query_cache_size: Number of query vectors kept in memory.
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1.")
+
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.query_cache_size = query_cache_size
+        self._queries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.connection_lock = threading.Lock()
+        with self.connection_lock:
+            self.connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS embedding_cache (
+                    key     TEXT PRIMARY KEY,
+                    model   TEXT NOT NULL,
+                    vector  BLOB NOT NULL
+                );
+                """
+            )
+            self.connection.commit()
+
+    @classmethod
+    def from_config(cls, embeddings: Embeddings, config: dict):
+        """
+        Creates a cache from the EMBEDDING_* configuration keys.
+        """
+        return cls(
+            embeddings,
+            config.get("EMBEDDING_MODEL", "nomic-embed-text"),
+            db_path=config.get("EMBEDDING_CACHE_PATH", ":memory:"),
+            batch_size=config.get("EMBEDDING_BATCH_SIZE", 32),
+        )
+
+    def make_key(self, text: str, kind: str = "document") -> str:
+        """
+        Cache key of a text: the model, the kind of embedding (some models embed queries
+        differently from documents) and the SHA-256 hash of the text.
+        """
+        text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{self.model_name}:{kind}:{text_hash}"
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Returns the vectors of the texts, computing only those that are not cached.
+        """
+        keys = [self.make_key(text) for text in texts]
+        vectors = self._load(set(keys))
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors:
+                missing.setdefault(key, text)
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+
+        missing_keys = list(missing)
+        for start in range(0, len(missing_keys), self.batch_size):
+            batch_keys = missing_keys[start:start + self.batch_size]
+            batch_vectors = self.embeddings.embed_documents([missing[key] for key in batch_keys])
+            new_vectors = dict(zip(batch_keys, batch_vectors))
+            self._store(new_vectors)
+            vectors.update(new_vectors)
+
+        return [vectors[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        Returns the vector of a search query, from memory, the database or the model.
+        """
+        key = self.make_key(text, "query")
+        with self.connection_lock:
+            vector = self._queries.get(key)
+            if vector is not None:
+                self._queries.move_to_end(key)
+                self.hits += 1
+                return vector
+
+        vector = self._load({key}).get(key)
+        if vector is None:
+            self.misses += 1
+            vector = self.embeddings.embed_query(text)
+            self._store({key: vector})
+        else:
+            self.hits += 1
+
+        with self.connection_lock:
+            self._queries[key] = vector
+            if len(self._queries) > self.query_cache_size:
+                self._queries.popitem(last=False)
+        return vector
+
+    def _load(self, keys: set) -> dict:
+        vectors = {}
+        keys = list(keys)
+        with self.connection_lock:
+            # Stay below SQLite's limit of host parameters per statement
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ", ".join("?" for _ in batch)
+                rows = self.connection.execute(
+                    f"SELECT key, vector FROM embedding_cache WHERE key IN ({placeholders})", batch
+                )
+                for key, blob in rows:
+                    vectors[key] = array("f", blob).tolist()
+        return vectors
+
+    def _store(self, vectors: dict):
+        with self.connection_lock:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO embedding_cache (key, model, vector) VALUES (?, ?, ?)",
+                [(key, self.model_name, array("f", vector).tobytes()) for key, vector in vectors.items()],
+            )
+            self.connection.commit()
+
+    def stats(self) -> dict:
+        with self.connection_lock:
+            entries = self.connection.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+    def close(self):
+        self.connection.close()
+
+
+def embeddings_from_config(config: dict) -> Embeddings:
+    """
+    Creates the embeddings of the vector clients from EMBEDDING_BACKEND:
+    'ollama' (default) - EMBEDDING_MODEL served by Ollama, cached with CachedEmbeddings;
+    'hashing' - HashingEmbeddings, computed in-process without any model or service.
+    """
+    backend = config.get("EMBEDDING_BACKEND", "ollama")
+    if backend == "hashing":
+        return HashingEmbeddings(config.get("HASHING_EMBEDDING_DIMENSIONS", 1024))
+    if backend != "ollama":
+        raise ValueError(f"Unknown EMBEDDING_BACKEND '{backend}', use 'ollama' or 'hashing'.")
+
+    # Imported here, so that the hashing backend runs without langchain_ollama
+    from langchain_ollama import OllamaEmbeddings
+    return CachedEmbeddings.from_config(OllamaEmbeddings(model=config.get("EMBEDDING_MODEL", "nomic-embed-text")), config)
@@ -0,0 +1,57 @@
+import hashlib
+import math
+import re
+from collections import Counter
+from typing import List
+from langchain_core.embeddings import Embeddings
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Embeddings computed in-process with the hashing trick, without any model or service,
+    so the local vector backend can run fully offline (EMBEDDING_BACKEND 'hashing').
+
+    Words, word pairs and the character trigrams of every word are hashed into
+    `dimensions` signed buckets, weighted with 1 + log(count), and the vector is
+    normalized. Similar vectors therefore mean shared vocabulary (trigrams also match
+    inflected forms), not shared meaning: synonyms and translations do not match.
+    """
+
+    def __init__(self, dimensions: int = 1024):
+        """
+        :param dimensions: Length of the vectors.
+        """
+        if dimensions < 1:
+            raise ValueError("dimensions must be at least 1.")
+        self.dimensions = dimensions
+
+    @staticmethod
+    def features(text: str) -> Counter:
+        """Weighted features of a text: words, word pairs and character trigrams (half weight)."""
+        words = _WORD_PATTERN.findall(text.lower())
+        features = Counter(words)
+        features.update(f"{first} {second}" for first, second in zip(words, words[1:]))
+        for word in words:
+            padded = f"#{word}#"
+            for i in range(len(padded) - 2):
+                features[f"#3:{padded[i:i + 3]}"] += 0.5
+        return features
+
+    def embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimensions
+        for feature, count in self.features(text).items():
+            digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+            # The top bit gives the sign, so colliding features tend to cancel out instead of adding up
+            sign = 1.0 if digest >> 63 else -1.0
+            vector[digest % self.dimensions] += sign * (1 + math.log(count) if count >= 1 else count)
+
+        norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+        return [value / norm for value in vector]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed(text)
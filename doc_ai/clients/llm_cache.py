@@ -0,0 +1,156 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Type
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+
+class LlmCache:
+    """
+    Disk-backed cache of parsed LLM responses, stored in its own SQLite database.
+
+    Entries are keyed by a hash of the model id, the rendered prompt (or image data)
+    and the output schema, and are evicted least-recently-used first once the cache
+    holds more than `max_entries` entries or `max_bytes` bytes.
+    """
+
+    def __init__(self, db_path: str, max_entries: int = 10000, max_bytes: int = None):
+        """
+        :param db_path: Path to the SQLite file holding the cache.
+        :param max_entries: Maximum number of cached responses.
+        :param max_bytes: Maximum total size of the cached responses, or None for no size limit.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.connection_lock = threading.Lock()
+        with self.connection_lock:
+            self.connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key          TEXT PRIMARY KEY,
+                    value        TEXT NOT NULL,
+                    size         INTEGER NOT NULL,
+                    last_access  REAL NOT NULL
+                );
+                """
+            )
+            self.connection.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_last_access ON llm_cache (last_access)")
+            self.connection.commit()
+
+    @classmethod
+    def from_config(cls, config: dict):
+        """
+        Creates a cache from the LLM_CACHE_* configuration keys, or returns None if
+        LLM_CACHE_PATH is not set.
+        """
+        if not config.get("LLM_CACHE_PATH"):
+            return None
+        max_mb = config.get("LLM_CACHE_MAX_MB")
+        return cls(
+            config["LLM_CACHE_PATH"],
+            max_entries=config.get("LLM_CACHE_MAX_ENTRIES", 10000),
+            max_bytes=int(max_mb * 1024 * 1024) if max_mb else None,
+        )
+
+    @staticmethod
+    def make_key(model_id: str, prompt: str | bytes, schema: str) -> str:
+        """
+        Builds the cache key for a request.
+
+        :param model_id: Identifier of the model that answers the request.
+        :param prompt: Rendered prompt text, or the image data sent to the model.
+        :param schema: Output schema the response is parsed into.
+        """
+        digest = hashlib.sha256()
+        for part in (model_id, prompt, schema):
+            part = part if isinstance(part, bytes) else str(part).encode("utf-8")
+            # Length prefix keeps ("ab", "c") and ("a", "bc") apart
+            digest.update(len(part).to_bytes(8, "big"))
+            digest.update(part)
+        return digest.hexdigest()
+
+    @staticmethod
+    def schema_of(model_cls: Type[BaseModel]) -> str:
+        return json.dumps(model_cls.model_json_schema(), sort_keys=True)
+
+    def get(self, key: str, model_cls: Type[BaseModel]) -> BaseModel | None:
+        """
+        Returns the cached response parsed into `model_cls`, or None on a miss.
+        """
+        with self.connection_lock:
+            row = self.connection.execute("SELECT value FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.connection.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (time.time(), key))
+            self.connection.commit()
+            self.hits += 1
+
+        try:
+            return model_cls.model_validate_json(row[0])
+        except Exception as e:
+            # The schema changed since the entry was written; treat it as a miss
+            logger.warning("Discarding cached LLM response that no longer validates: %s", e)
+            self.delete(key)
+            return None
+
+    def set(self, key: str, value: BaseModel):
+        """
+        Stores a parsed response and evicts the least recently used entries if needed.
+        """
+        data = value.model_dump_json()
+        with self.connection_lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, data, len(data.encode("utf-8")), time.time()),
+            )
+            self._evict()
+            self.connection.commit()
+
+    def delete(self, key: str):
+        with self.connection_lock:
+            self.connection.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            self.connection.commit()
+
+    def _evict(self):
+        self.connection.execute(
+            """
+            DELETE FROM llm_cache WHERE key IN (
+                SELECT key FROM llm_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.max_entries,),
+        )
+        if self.max_bytes:
+            self.connection.execute(
+                """
+                DELETE FROM llm_cache WHERE key IN (
+                    SELECT key FROM (
+                        SELECT key, SUM(size) OVER (ORDER BY last_access DESC) AS running_size FROM llm_cache
+                    ) WHERE running_size > ?
+                )
+                """,
+                (self.max_bytes,),
+            )
+
+    def stats(self) -> dict:
+        """
+        Returns hit/miss counters together with the current number and size of entries.
+        """
+        with self.connection_lock:
+            entries, size = self.connection.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": size}
+
+    def close(self):
+        # Waits for a get or set still running in another thread
+        with self.connection_lock:
+            self.connection.close()
@@ -0,0 +1,467 @@
+import logging
+import os
+import sqlite3
+import threading
+from pathlib import Path
+import numpy as np
+from langchain_core.documents import Document as LangchainDocument
+from langchain_core.embeddings import Embeddings
+from doc_ai.clients.embedding_cache import embeddings_from_config
+from doc_ai.clients.search_cache import SearchResultCache
+from doc_ai.configs.models import Document
+
+EMBEDDING_MODEL = "nomic-embed-text"
+
+
+class LocalVdbClient:
+    """
+    In-process vector index with the interface of VdbClient, for machines without
+    Weaviate and for CI.
+
+    Normalized float32 embeddings are stored in a memory-mapped .npy file next to the
+    SQLite database, and searched with one matrix-vector product (cosine similarity)
+    and a partial sort. For large collections an IVF index (k-means clusters of the
+    vectors) can be built, so a search only scores the vectors of the closest clusters.
+
+    Row bookkeeping (uuid, db_id, deleted flag) lives in the `vector_rows` table of a
+    separate SQLite file next to the vectors, so the index never competes with the
+    single writer of the documents database. Document properties for results are read
+    from the documents table over a read-only connection.
+    """
+
+    def __init__(self, db_path: str, collection_name="Documents", table_name: str = 'documents',
+                 embeddings: Embeddings = None, batch_size: int = 100, ivf_lists: int = 0, ivf_probes: int = 8,
+                 ivf_min_rows: int = 20000, search_cache: SearchResultCache = None, on_failed_objects=None):
+        """
+        :param db_path: Path to the SQLite documents database; the vectors are stored in
+            `<db_path without suffix>.<collection>.npy` and their rows in `<db_path without suffix>.<collection>.rows.db`.
+        :param collection_name: Name of the index, part of the file name.
+        :param table_name: Documents table that search results are read from.
+        :param embeddings: Embeddings used for documents and queries (CachedEmbeddings of nomic-embed-text by default,
+            HashingEmbeddings to run without any service).
+        :param batch_size: Number of buffered documents that triggers a write.
+        :param ivf_lists: Number of IVF clusters, 0 for exact search only.
+        :param ivf_probes: Number of clusters scored per search.
+        :param ivf_min_rows: Below this number of vectors the index is not used, exact search is fast enough.
+        :param search_cache: Cache for search results, invalidated whenever documents are written or deleted.
+        :param on_failed_objects: Called with the uuids of the documents that a flush could not embed.
+        """
+        self.collection_name = collection_name
+        self.table_name = table_name
+        if embeddings is None:
+            embeddings = embeddings_from_config({"EMBEDDING_MODEL": EMBEDDING_MODEL})
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        self.ivf_lists = ivf_lists
+        self.ivf_probes = ivf_probes
+        self.ivf_min_rows = ivf_min_rows
+        self.search_cache = search_cache
+
+        self.db_path = db_path
+        self.vectors_path = f"{os.path.splitext(db_path)[0]}.{collection_name.lower()}.npy"
+        self.rows_path = f"{os.path.splitext(db_path)[0]}.{collection_name.lower()}.rows.db"
+        self.on_failed_objects = on_failed_objects
+        self.failed_objects = []  # uuids of the documents that could not be embedded
+        self._buffer = []  # (properties, uuid)
+        self._lock = threading.RLock()
+
+        self.connection = sqlite3.connect(self.rows_path, check_same_thread=False)
+        # Opened on the first search, the documents database may not exist yet
+        self._documents_connection = None
+        self.create_collection()
+        self._load()
+
+    @classmethod
+    def from_config(cls, config: dict, collection_name="Documents"):
+        """
+        Creates a local index next to SQLDB_DB_PATH with the LOCAL_VDB_* and EMBEDDING_* configuration keys.
+        """
+        return cls(
+            config["SQLDB_DB_PATH"],
+            collection_name,
+            table_name=config.get("SQLITE_TABLE_NAME", "documents"),
+            embeddings=embeddings_from_config(config),
+            batch_size=config.get("VDB_BATCH_SIZE", 100),
+            ivf_lists=config.get("LOCAL_VDB_IVF_LISTS", 0),
+            ivf_probes=config.get("LOCAL_VDB_IVF_PROBES", 8),
+            search_cache=SearchResultCache.from_config(config),
+        )
+
+    # ------------------------------------------------------------------------
+    # Storage
+    # ------------------------------------------------------------------------
+    def create_collection(self):
+        """Create the row table of the index (the vector file is created on the first write)."""
+        with self._lock:
+            self.connection.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS vector_rows (
+                    collection  TEXT NOT NULL,
+                    row         INTEGER NOT NULL,
+                    uuid        TEXT NOT NULL,
+                    db_id       INTEGER,
+                    deleted     INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (collection, row)
+                )
+                """
+            )
+            self.connection.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS idx_vector_rows_uuid ON vector_rows (collection, uuid)"
+            )
+            self.connection.commit()
+
+    def delete_collection(self):
+        """Delete the index with all its vectors."""
+        with self._lock:
+            self.connection.execute("DELETE FROM vector_rows WHERE collection = ?", (self.collection_name,))
+            self.connection.commit()
+            self._vectors = None
+            if os.path.exists(self.vectors_path):
+                os.remove(self.vectors_path)
+            self._load()
+        self._invalidate_searches()
+
+    def _load(self):
+        rows = self.connection.execute(
+            "SELECT row, uuid, db_id, deleted FROM vector_rows WHERE collection = ? ORDER BY row",
+            (self.collection_name,),
+        ).fetchall()
+        self.count = len(rows)
+        self.uuids = [uuid for _, uuid, _, _ in rows]
+        self.db_ids = [db_id for _, _, db_id, _ in rows]
+        self.rows_by_uuid = {uuid: row for row, uuid, _, _ in rows}
+        self.alive = np.array([not deleted for _, _, _, deleted in rows], dtype=bool)
+
+        self._vectors = None
+        if os.path.exists(self.vectors_path):
+            self._vectors = np.lib.format.open_memmap(self.vectors_path, mode="r+")
+            if self._vectors.shape[0] < self.count:
+                raise ValueError(f"Vector file '{self.vectors_path}' has fewer rows than the index, rebuild it.")
+        self._centroids = None
+        self._lists = None
+
+    def _ensure_capacity(self, rows: int, dim: int):
+        """
+        Grows the vector file to hold `rows` vectors. The capacity doubles, so appends
+        copy the file only O(log n) times.
+        """
+        if self._vectors is not None and self._vectors.shape[1] != dim:
+            raise ValueError(f"Embedding dimension {dim} does not match the index ({self._vectors.shape[1]}).")
+        capacity = 0 if self._vectors is None else self._vectors.shape[0]
+        if rows <= capacity:
+            return
+
+        new_capacity = max(rows, 2 * capacity, 1024)
+        tmp_path = f"{self.vectors_path}.tmp.npy"
+        grown = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32, shape=(new_capacity, dim))
+        if self._vectors is not None:
+            grown[:self.count] = self._vectors[:self.count]
+        grown.flush()
+        del grown
+        self._vectors = None
+        os.replace(tmp_path, self.vectors_path)
+        self._vectors = np.lib.format.open_memmap(self.vectors_path, mode="r+")
+
+    # ------------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------------
+    def add_document_vdb(self, document: Document, last_row_id: int = None):
+        """
+        Add a document to the index. Documents are buffered and written with the next
+        flush, which also happens before every search.
+        """
+        with self._lock:
+            self._buffer.append((self.make_properties(document, last_row_id), str(document.uuid)))
+            full = len(self._buffer) >= self.batch_size
+        self._invalidate_searches()
+        if full:
+            self.flush()
+
+    def _invalidate_searches(self):
+        if self.search_cache is not None:
+            self.search_cache.invalidate()
+
+    def flush(self) -> list:
+        """
+        Embeds the buffered documents and appends their vectors to the index. Documents
+        that could not be embedded are added to `failed_objects` and passed to `on_failed_objects`.
+
+        :return: list - The uuids of the documents that could not be embedded.
+        """
+        with self._lock:
+            objects, self._buffer = self._buffer, []
+        if not objects:
+            return []
+
+        failed = self.write_objects(objects)
+        if failed:
+            self.failed_objects.extend(failed)
+            if self.on_failed_objects is not None:
+                self.on_failed_objects(failed)
+        return failed
+
+    @staticmethod
+    def make_properties(document: Document, last_row_id: int = None) -> dict:
+        # add title to search term text, as in VdbClient
+        return {"text": document.title + "\n\n" + document.text, "db_id": last_row_id}
+
+    def write_objects(self, objects: list) -> list:
+        """
+        Embeds objects and appends them to the index, bypassing the buffer. The embedding
+        runs outside the index lock, so several calls can embed in parallel.
+
+        :param objects: (properties, uuid) tuples, with properties from make_properties.
+        :return: list - The uuids of the objects that could not be embedded.
+        """
+        try:
+            vectors = np.asarray(
+                self.embeddings.embed_documents([properties["text"] for properties, _ in objects]), dtype=np.float32
+            )
+        except Exception as e:
+            logging.error(f"Embedding {len(objects)} documents for the local index failed: {e}")
+            return [str(uuid) for _, uuid in objects]
+
+        self.add_vectors(vectors, [str(uuid) for _, uuid in objects], [properties["db_id"] for properties, _ in objects])
+        return []
+
+    def add_vectors(self, vectors: np.ndarray, uuids: list, db_ids: list):
+        """
+        Appends vectors (normalized here) to the index. A uuid that is already indexed
+        is replaced: its old row is marked deleted.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        # A uuid that occurs twice in the batch keeps its last vector only; otherwise the unique
+        # uuid index would drop a stored row and the rows would no longer line up with the file
+        last = {uuid: i for i, uuid in enumerate(uuids)}
+        if len(last) < len(uuids):
+            keep = sorted(last.values())
+            vectors = vectors[keep]
+            uuids = [uuids[i] for i in keep]
+            db_ids = [db_ids[i] for i in keep]
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+
+        with self._lock:
+            self._ensure_capacity(self.count + len(vectors), vectors.shape[1])
+            start = self.count
+            self._vectors[start:start + len(vectors)] = vectors
+            self._vectors.flush()
+
+            replaced = [self.rows_by_uuid[uuid] for uuid in uuids if uuid in self.rows_by_uuid]
+            if replaced:
+                self._mark_deleted(replaced)
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO vector_rows (collection, row, uuid, db_id, deleted) VALUES (?, ?, ?, ?, 0)",
+                [(self.collection_name, start + i, uuid, db_id) for i, (uuid, db_id) in enumerate(zip(uuids, db_ids))],
+            )
+            self.connection.commit()
+
+            self.count += len(vectors)
+            self.uuids.extend(uuids)
+            self.db_ids.extend(db_ids)
+            self.rows_by_uuid.update({uuid: start + i for i, uuid in enumerate(uuids)})
+            self.alive = np.concatenate([self.alive, np.ones(len(vectors), dtype=bool)])
+            if self._centroids is not None:
+                # New vectors join their nearest cluster, the clusters themselves stay fixed
+                self._add_to_lists(np.arange(start, start + len(vectors)), self._assign(vectors))
+        self._invalidate_searches()
+
+    def delete_objects(self, uuids_to_delete: list):
+        with self._lock:
+            rows = [self.rows_by_uuid[str(uuid)] for uuid in uuids_to_delete if str(uuid) in self.rows_by_uuid]
+            self._mark_deleted(rows)
+            self.connection.commit()
+        self._invalidate_searches()
+
+    def _mark_deleted(self, rows: list):
+        # The uuid moves to its new row (or is gone), so the old row must not keep the unique uuid
+        self.connection.executemany(
+            "UPDATE vector_rows SET deleted = 1, uuid = uuid || ':deleted:' || row WHERE collection = ? AND row = ?",
+            [(self.collection_name, row) for row in rows],
+        )
+        for row in rows:
+            self.alive[row] = False
+            self.rows_by_uuid.pop(self.uuids[row], None)
+
+    # ------------------------------------------------------------------------
+    # IVF index
+    # ------------------------------------------------------------------------
+    def build_index(self, n_lists: int = None, iterations: int = 10, sample_size: int = 50000):
+        """
+        Clusters the vectors with k-means (on a sample) for approximate search. Vectors
+        added later are assigned to their nearest cluster; rebuild after the collection
+        has grown a lot.
+
+        :param n_lists: Number of clusters, by default about sqrt(number of vectors).
+        :param iterations: Number of k-means iterations.
+        :param sample_size: Number of vectors the clusters are trained on.
+        """
+        with self._lock:
+            if self._vectors is None or self.count == 0:
+                return
+            vectors = self._vectors[:self.count]
+            n_lists = n_lists or max(1, int(np.sqrt(self.count)))
+            rng = np.random.default_rng(0)
+
+            sample = vectors[rng.choice(self.count, min(sample_size, self.count), replace=False)]
+            centroids = sample[rng.choice(len(sample), min(n_lists, len(sample)), replace=False)].copy()
+            for _ in range(iterations):
+                labels = np.argmax(sample @ centroids.T, axis=1)
+                for i in range(len(centroids)):
+                    members = sample[labels == i]
+                    if len(members):
+                        centroid = members.mean(axis=0)
+                        centroids[i] = centroid / (np.linalg.norm(centroid) or 1)
+
+            self._centroids = centroids
+            self._lists = [np.empty(0, dtype=np.int64) for _ in range(len(centroids))]
+            self._add_to_lists(np.arange(self.count), self._assign(vectors))
+            logging.info(f"Built IVF index with {len(centroids)} lists over {self.count} vectors.")
+
+    def _add_to_lists(self, rows: np.ndarray, labels: np.ndarray):
+        # Inverted lists: the rows of every cluster, so a search only touches the probed clusters
+        if not len(rows):
+            return
+        order = np.argsort(labels, kind="stable")
+        rows, labels = rows[order], labels[order]
+        boundaries = np.flatnonzero(np.diff(labels)) + 1
+        for label, cluster_rows in zip(labels[np.r_[0, boundaries]], np.split(rows, boundaries)):
+            self._lists[label] = np.concatenate([self._lists[label], cluster_rows])
+
+    def _assign(self, vectors: np.ndarray, chunk: int = 65536) -> np.ndarray:
+        return np.concatenate([
+            np.argmax(vectors[i:i + chunk] @ self._centroids.T, axis=1) for i in range(0, len(vectors), chunk)
+        ]) if len(vectors) else np.empty(0, dtype=np.int64)
+
+    # ------------------------------------------------------------------------
+    # Search
+    # ------------------------------------------------------------------------
+    def search_vector(self, vector, k: int = 5) -> list:
+        """
+        Returns the k most similar documents to a query vector.
+
+        :return: list - (uuid, db_id, cosine similarity) tuples, best first.
+        """
+        with self._lock:
+            if self._vectors is None or self.count == 0:
+                return []
+
+            query = np.asarray(vector, dtype=np.float32)
+            query = query / (np.linalg.norm(query) or 1)
+
+            if self.ivf_lists and self._centroids is None and self.alive.sum() >= self.ivf_min_rows:
+                self.build_index(self.ivf_lists)
+
+            if self._centroids is not None and self.count >= self.ivf_min_rows:
+                probes = np.argsort(-(self._centroids @ query))[:self.ivf_probes]
+                candidates = np.concatenate([self._lists[probe] for probe in probes])
+                candidates = candidates[self.alive[candidates]]
+                scores = self._vectors[candidates] @ query
+            else:
+                candidates = None
+                scores = self._vectors[:self.count] @ query
+                scores[~self.alive] = -np.inf
+
+            k = min(k, len(scores))
+            if k == 0:
+                return []
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+
+            results = []
+            for index in top:
+                if not np.isfinite(scores[index]):
+                    continue
+                row = candidates[index] if candidates is not None else index
+                results.append((self.uuids[row], self.db_ids[row], float(scores[index])))
+            return results
+
+    def search_documents(self, query: str, k: int = 3) -> list:
+        """
+        Search for documents based on a query.
+
+        :return: list - Dicts with the document columns, uuid and score (cosine similarity, higher is better).
+        """
+        self.flush()
+        if self.search_cache is None:
+            return self._search_documents(query, k)
+        key = SearchResultCache.make_key("search_documents", query, k)
+        return self.search_cache.get_or_compute(key, lambda: self._search_documents(query, k))
+
+    def _search_documents(self, query: str, k: int) -> list:
+        hits = self.search_vector(self.embeddings.embed_query(query), k)
+        if not hits:
+            return []
+
+        placeholders = ", ".join("?" for _ in hits)
+        with self._lock:
+            if self._documents_connection is None:
+                self._documents_connection = sqlite3.connect(
+                    f"{Path(self.db_path).resolve().as_uri()}?mode=ro", uri=True, check_same_thread=False
+                )
+            cursor = self._documents_connection.execute(
+                f"SELECT id, title, summary, text, category, filepath, tags, timestamp FROM {self.table_name} "
+                f"WHERE id IN ({placeholders})",
+                [db_id for _, db_id, _ in hits],
+            )
+            names = [column[0] for column in cursor.description]
+            rows = {row[0]: dict(zip(names, row)) for row in cursor.fetchall()}
+
+        return [
+            {**rows.get(db_id, {"id": db_id}), "uuid": uuid, "score": score}
+            for uuid, db_id, score in hits
+        ]
+
+    def langchain_search(self, query: str):
+        """Search returning (langchain Document, score) pairs like VdbClient.langchain_search."""
+        return [
+            (
+                LangchainDocument(
+                    page_content=result.get("text") or "",
+                    metadata={key: value for key, value in result.items() if key not in ("text", "score")},
+                ),
+                result["score"],
+            )
+            for result in self.search_documents(query, k=5)
+        ]
+
+    def get_all_objects(self, include_vector = False):
+        for item in self.iter_objects(include_vector):
+            print(item["properties"])
+            print(item["vector"])
+
+    def iter_objects(self, include_vector = False):
+        """
+        Streams all objects of the index.
+
+        :return: Iterator of dicts with uuid, properties (db_id) and vector (None unless include_vector).
+        """
+        for row in range(self.count):
+            with self._lock:
+                if not self.alive[row]:
+                    continue
+                item = {
+                    "uuid": self.uuids[row],
+                    "properties": {"db_id": self.db_ids[row]},
+                    "vector": self._vectors[row].tolist() if include_vector else None,
+                }
+            yield item
+
+    def close(self):
+        """Writes the buffered documents and closes the index."""
+        try:
+            self.flush()
+        finally:
+            with self._lock:
+                if self._vectors is not None:
+                    self._vectors.flush()
+                    self._vectors = None
+                self.connection.close()
+                if self._documents_connection is not None:
+                    self._documents_connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -3,6 +3,7 @@ from langchain.chains import TransformChain
 from langchain_core.messages import HumanMessage
 from langchain_openai import ChatOpenAI
 from langchain_core.runnables import chain
+from doc_ai.clients.rate_limiter import LlmRateLimiter, IMAGE_TOKEN_ESTIMATE
 
 @chain
 def image_model(inputs: dict) -> str | list[str] | dict:
@@ -22,6 +23,24 @@ def image_model(inputs: dict) -> str | list[str] | dict:
     return msg.content
 
 
+@chain
+async def aimage_model(inputs: dict) -> str | list[str] | dict:
+    """Invoke model with image and prompt without blocking the event loop."""
+    model = ChatOpenAI(api_key=inputs["api_key"],
+                       temperature=0.5,
+                       model="gpt-4o",
+                       max_tokens=1024)
+    msg = await model.ainvoke(
+        [HumanMessage(
+            content=[
+                {"type": "text", "text": inputs["prompt"]},
+                {"type": "text", "text": inputs["parser"].get_format_instructions()},
+                {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{inputs['image']}"}},
+            ])]
+    )
+    return msg.content
+
+
 def load_image(inputs: dict) -> dict:
     """Load image from file and encode it as base64."""
     image_path = inputs["image_path"]
@@ -42,9 +61,10 @@ load_image_chain = TransformChain(
 class OpenAIClient:
     """A class for analyzing images by piping tasks into a chain."""
 
-    def __init__(self, config, parser):
+    def __init__(self, config, parser, rate_limiter: LlmRateLimiter = None):
         self.config = config
         self.parser = parser
+        self.rate_limiter = rate_limiter or LlmRateLimiter.from_config(config)
 
     def invoke_img(self, prompt, image_path: str) -> dict:
 
@@ -54,11 +74,29 @@ class OpenAIClient:
                 | image_model          # passes { "image": ..., "prompt": ... }
                 | self.parser
         )
-        return vision_chain.invoke(
-            {
-                "api_key": self.config["OPENAI_API_KEY"],
-                "parser": self.parser,
-                "image_path": image_path,
-                "prompt": prompt,
-            }
+        with self.rate_limiter.limit(IMAGE_TOKEN_ESTIMATE):
+            return vision_chain.invoke(
+                {
+                    "api_key": self.config["OPENAI_API_KEY"],
+                    "parser": self.parser,
+                    "image_path": image_path,
+                    "prompt": prompt,
+                }
+            )
+
+    async def ainvoke_img(self, prompt, image_path: str) -> dict:
+
+        vision_chain = (
+                load_image_chain
+                | aimage_model
+                | self.parser
         )
+        async with self.rate_limiter.alimit(IMAGE_TOKEN_ESTIMATE):
+            return await vision_chain.ainvoke(
+                {
+                    "api_key": self.config["OPENAI_API_KEY"],
+                    "parser": self.parser,
+                    "image_path": image_path,
+                    "prompt": prompt,
+                }
+            )
@@ -0,0 +1,140 @@
+import asyncio
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+
+# Rough number of input tokens a page image costs on Claude/GPT-4o vision models.
+IMAGE_TOKEN_ESTIMATE = 1600
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimates the number of tokens in a text with the same 4 characters per token
+    rule of thumb that is used for the context length check.
+    """
+    return len(text or "") // 4
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket that refills continuously at `rate_per_minute`.
+
+    Callers reserve tokens up front and then sleep for as long as the bucket is
+    in debt, so the lock is never held while waiting and the same bucket can be
+    shared between threads and event loops.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: float = None):
+        """
+        :param rate_per_minute: Number of tokens added to the bucket per minute.
+        :param capacity: Maximum burst size. Defaults to one minute worth of tokens.
+        """
+        if rate_per_minute <= 0:
+            raise ValueError("rate_per_minute must be positive.")
+
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self, amount: float) -> float:
+        """Takes `amount` tokens and returns the number of seconds to wait before using them."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # A single request larger than the bucket would otherwise never be admitted
+            self.tokens -= min(amount, self.capacity)
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def acquire(self, amount: float = 1):
+        wait = self._reserve(amount)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def aacquire(self, amount: float = 1):
+        wait = self._reserve(amount)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class LlmRateLimiter:
+    """
+    Limits concurrent LLM requests and keeps them under requests-per-minute and
+    tokens-per-minute quotas. One instance can be shared by several clients so
+    that they draw from the same account quota.
+
+    Sync calls and async calls in any number of event loops take their slot from
+    the same semaphore, so together they never exceed `max_concurrency`.
+    """
+
+    def __init__(self, max_concurrency: int = 8, requests_per_minute: float = None, tokens_per_minute: float = None):
+        """
+        :param max_concurrency: Maximum number of requests in flight at the same time.
+        :param requests_per_minute: Request quota, or None for no limit.
+        :param tokens_per_minute: Input token quota, or None for no limit.
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1.")
+
+        self.max_concurrency = max_concurrency
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self._thread_semaphore = threading.BoundedSemaphore(max_concurrency)
+        # Queue the coroutines of one loop, so that at most max_concurrency of them poll
+        # for a slot; asyncio semaphores are bound to the loop they are first used in
+        self._async_semaphores = weakref.WeakKeyDictionary()
+
+    @classmethod
+    def from_config(cls, config: dict):
+        """
+        Creates a limiter from the LLM_MAX_CONCURRENCY, LLM_REQUESTS_PER_MINUTE
+        and LLM_TOKENS_PER_MINUTE configuration keys.
+        """
+        return cls(
+            max_concurrency=config.get("LLM_MAX_CONCURRENCY", 8),
+            requests_per_minute=config.get("LLM_REQUESTS_PER_MINUTE"),
+            tokens_per_minute=config.get("LLM_TOKENS_PER_MINUTE"),
+        )
+
+    def _async_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._async_semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._async_semaphores[loop] = semaphore
+        return semaphore
+
+    async def _aacquire_slot(self):
+        # Polls the shared semaphore instead of blocking the event loop on it; unlike a
+        # blocking acquire in a worker thread, a cancelled wait cannot leak a slot
+        delay = 0.005
+        while not self._thread_semaphore.acquire(blocking=False):
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.1)
+
+    @contextmanager
+    def limit(self, estimated_tokens: int = 0):
+        """Blocks until a request of `estimated_tokens` input tokens may be sent."""
+        with self._thread_semaphore:
+            if self.requests:
+                self.requests.acquire(1)
+            if self.tokens and estimated_tokens:
+                self.tokens.acquire(estimated_tokens)
+            yield
+
+    @asynccontextmanager
+    async def alimit(self, estimated_tokens: int = 0):
+        """Async counterpart of `limit`."""
+        async with self._async_semaphore():
+            await self._aacquire_slot()
+            try:
+                if self.requests:
+                    await self.requests.aacquire(1)
+                if self.tokens and estimated_tokens:
+                    await self.tokens.aacquire(estimated_tokens)
+                yield
+            finally:
+                self._thread_semaphore.release()
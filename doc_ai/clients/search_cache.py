@@ -0,0 +1,100 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class SearchResultCache:
+    """
+    In-memory LRU cache of search results with a time-to-live.
+
+    The cache belongs to one collection and carries a generation counter that the
+    vector client increments whenever the collection changes (documents written or
+    deleted). Incrementing it drops all entries, and a result computed while the
+    generation changed is not stored, so no result outlives the ingest that made it stale.
+
+    Cached results are returned as they are, callers must not modify them.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 300):
+        """
+        :param max_entries: Maximum number of cached results.
+        :param ttl_seconds: Maximum age of a cached result, or None for no limit.
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (time stored, result)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: dict):
+        """
+        Creates a cache from the SEARCH_CACHE_* configuration keys, or returns None if
+        SEARCH_CACHE_MAX_ENTRIES is 0.
+        """
+        max_entries = config.get("SEARCH_CACHE_MAX_ENTRIES", 256)
+        if not max_entries:
+            return None
+        return cls(max_entries, ttl_seconds=config.get("SEARCH_CACHE_TTL_SECONDS", 300))
+
+    @staticmethod
+    def make_key(kind: str, query: str, k: int, filters: dict = None) -> tuple:
+        """
+        Builds the key of a search: the search function, the query with case and
+        whitespace normalized, the number of results and the filters.
+        """
+        normalized = " ".join(query.lower().split())
+        return kind, normalized, k, tuple(sorted((filters or {}).items()))
+
+    def get(self, key: tuple):
+        """
+        Returns the cached result, or None on a miss or if the entry expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl_seconds is not None and time.monotonic() - entry[0] > self.ttl_seconds:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: tuple, result, generation: int):
+        """
+        Stores a result computed at `generation`; it is dropped if the collection changed since.
+        """
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._entries[key] = (time.monotonic(), result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, key: tuple, compute):
+        """
+        Returns the cached result for `key`, or calls `compute()` and caches its result.
+        """
+        generation = self.generation
+        result = self.get(key)
+        if result is None:
+            result = compute()
+            self.set(key, result, generation)
+        return result
+
+    def invalidate(self):
+        """
+        Marks the collection as changed: increments the generation and drops all entries.
+        """
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries), "generation": self.generation}
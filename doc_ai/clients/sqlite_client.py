@@ -1,22 +1,262 @@
 import sqlite3
 import json
+import logging
+import queue
 import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from datetime import date, datetime
+from pathlib import Path
+from typing import List, Tuple
 from doc_ai.configs.models import Document
 
+# Connection settings used unless the configuration overrides them (see pragmas_from_config).
+# WAL lets readers run next to the writer and turns every commit into one sequential
+# append instead of a rollback journal write plus fsync of the database file.
+DEFAULT_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",  # With WAL, only a checkpoint fsyncs; a power loss can lose the last commits but never corrupts
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -64 * 1024,  # Negative values are in KiB, i.e. 64 MiB
+    "temp_store": "MEMORY",
+}
+
+
+def pragmas_from_config(config: dict) -> dict:
+    """
+    Builds the connection pragmas from the SQLITE_* configuration keys.
+    """
+    pragmas = dict(DEFAULT_PRAGMAS)
+    pragmas["journal_mode"] = config.get("SQLITE_JOURNAL_MODE", pragmas["journal_mode"])
+    pragmas["synchronous"] = config.get("SQLITE_SYNCHRONOUS", pragmas["synchronous"])
+    if config.get("SQLITE_MMAP_SIZE_MB") is not None:
+        pragmas["mmap_size"] = int(config["SQLITE_MMAP_SIZE_MB"] * 1024 * 1024)
+    if config.get("SQLITE_CACHE_SIZE_MB") is not None:
+        pragmas["cache_size"] = -int(config["SQLITE_CACHE_SIZE_MB"] * 1024)
+    return pragmas
+
+
+# Columns of the documents table covered by full-text search, and their BM25 weights
+FTS_COLUMNS = ("title", "summary", "text", "text_orig", "tags")
+FTS_WEIGHTS = {"title": 10.0, "summary": 5.0, "text": 1.0, "text_orig": 1.0, "tags": 3.0}
+
+
+def fts_query(text: str) -> str:
+    """
+    Turns user input into an FTS5 query in which every word must match. Each word is
+    quoted, so FTS5 operators and punctuation in the input cannot cause syntax errors,
+    and words such as 'INV-2023-0042' match as a phrase of their parts.
+    """
+    terms = [term.replace('"', '""') for term in text.split()]
+    return " AND ".join(f'"{term}"' for term in terms if term.strip('"'))
+
+
+def _sql_timestamp(value) -> str:
+    """
+    Formats a date or datetime the way sqlite3 stores Document.timestamp ('YYYY-MM-DD HH:MM:SS'),
+    so that it compares correctly with the timestamp column. Strings are used as they are.
+    """
+    if isinstance(value, datetime):
+        return value.isoformat(" ")
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)
+
+
+_INSERT_DOCUMENT_SQL = """
+    INSERT INTO {table_name} (
+        title, summary, text, text_orig, category,
+        filepath, tags, timestamp, langs, filepath_orig, vdb_uuid, content_hash
+    )
+    VALUES (
+        :title, :summary, :text, :text_orig, :category,
+        :filepath, :tags, :timestamp, :langs, :filepath_orig, :uuid, :content_hash
+    )
+"""
+
+
+# Pragmas that only concern the connection that writes; the others are applied to readers as well
+_WRITER_ONLY_PRAGMAS = ("journal_mode", "synchronous")
+
+
+class ReadConnectionPool:
+    """
+    A pool of read-only connections to a WAL database. In WAL mode readers see the
+    last committed state and neither block nor wait for the writer, so searches and
+    reports can run while documents are being ingested.
+
+    A thread checks a connection out with `with pool.connection() as connection:`;
+    nested checkouts in the same thread reuse the connection the thread already holds.
+    Connections are opened lazily, at most `size` of them; further threads wait until
+    one is returned. The pool itself is a context manager that closes all connections.
+    """
+
+    def __init__(self, db_path: str, size: int = 4, pragmas: dict = None):
+        """
+        :param db_path: Path to the SQLite database file.
+        :param size: Maximum number of read connections.
+        :param pragmas: Connection pragmas for the readers, e.g. mmap_size and cache_size.
+        """
+        if size < 1:
+            raise ValueError("size must be at least 1.")
+
+        self.db_path = db_path
+        self.size = size
+        self.pragmas = {name: value for name, value in (pragmas or {}).items() if name not in _WRITER_ONLY_PRAGMAS}
+        self._idle = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._closed = False
+
+    @contextmanager
+    def connection(self):
+        """
+        Checks out a read-only connection for the current thread.
+        """
+        held = getattr(self._local, "connection", None)
+        if held is not None:
+            self._local.depth += 1
+            try:
+                yield held
+            finally:
+                self._local.depth -= 1
+            return
+
+        connection = self._acquire()
+        self._local.connection, self._local.depth = connection, 1
+        try:
+            yield connection
+        finally:
+            self._local.connection = None
+            self._release(connection)
+
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            connection = self._idle.get_nowait()
+        except queue.Empty:
+            connection = None
+
+        if connection is None:
+            with self._lock:
+                if self._closed:
+                    raise RuntimeError("ReadConnectionPool is closed.")
+                if self._opened < self.size:
+                    self._opened += 1
+                    return self._open()
+
+            # Wait for a connection in short steps, so that close() also ends the wait
+            while connection is None:
+                if self._closed:
+                    raise RuntimeError("ReadConnectionPool is closed.")
+                try:
+                    connection = self._idle.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+
+        if self._closed:
+            self._release(connection)
+            raise RuntimeError("ReadConnectionPool is closed.")
+        return connection
+
+    def _release(self, connection: sqlite3.Connection):
+        with self._lock:
+            if self._closed:
+                # Checked out while the pool was closed
+                connection.close()
+            else:
+                self._idle.put(connection)
+
+    def _open(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(
+            f"{Path(self.db_path).resolve().as_uri()}?mode=ro", uri=True, check_same_thread=False
+        )
+        for name, value in self.pragmas.items():
+            connection.execute(f"PRAGMA {name} = {value}")
+        return connection
+
+    def close(self):
+        """
+        Closes the idle connections; connections in use are closed when they are returned.
+        """
+        with self._lock:
+            self._closed = True
+            while True:
+                try:
+                    self._idle.get_nowait().close()
+                except queue.Empty:
+                    break
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
 class DocumentDatabase:
     _instance = None
     _lock = threading.Lock()
 
-    def __new__(cls, db_path):
+    def __new__(cls, db_path, pragmas: dict = None, read_connections: int = 4):
+        """
+        :param db_path: Path to the SQLite database file.
+        :param pragmas: Connection pragmas applied when the connection is opened, DEFAULT_PRAGMAS if not given.
+        :param read_connections: Size of the pool of read-only connections used by the queries (WAL mode only).
+            With 0, reads share the write connection.
+        """
         with cls._lock:
             if cls._instance is None:
                 cls._instance = super(DocumentDatabase, cls).__new__(cls)
-                cls._instance._init_db(db_path)
+                cls._instance._init_db(db_path, pragmas, read_connections)
         return cls._instance
 
-    def _init_db(self, db_path):
+    def _init_db(self, db_path, pragmas: dict = None, read_connections: int = 4):
         self.connection = sqlite3.connect(db_path, check_same_thread=False)
         self.connection_lock = threading.Lock()
+        pragmas = DEFAULT_PRAGMAS if pragmas is None else pragmas
+        self.apply_pragmas(pragmas)
+
+        # Separate readers only help (and only see committed data without blocking) in WAL mode
+        journal_mode = self.connection.execute("PRAGMA journal_mode").fetchone()[0]
+        self.read_pool = None
+        if read_connections and journal_mode.lower() == "wal":
+            self.read_pool = ReadConnectionPool(db_path, read_connections, pragmas)
+
+    @contextmanager
+    def read_connection(self):
+        """
+        Connection for read-only queries: one from the read pool, or the write
+        connection (under its lock) if there is no pool.
+        """
+        if self.read_pool is None:
+            with self.connection_lock:
+                yield self.connection
+        else:
+            with self.read_pool.connection() as connection:
+                yield connection
+
+    def close(self):
+        if self.read_pool is not None:
+            self.read_pool.close()
+        with self.connection_lock:
+            self.connection.close()
+        # The next DocumentDatabase(...) opens a new connection instead of returning this closed one
+        with DocumentDatabase._lock:
+            if DocumentDatabase._instance is self:
+                DocumentDatabase._instance = None
+
+    def apply_pragmas(self, pragmas: dict):
+        """
+        Applies connection pragmas, e.g. {"journal_mode": "WAL", "synchronous": "NORMAL"}.
+        """
+        with self.connection_lock:
+            for name, value in pragmas.items():
+                result = self.connection.execute(f"PRAGMA {name} = {value}").fetchone()
+                # journal_mode returns the mode in effect, which stays e.g. 'memory' for in-memory databases
+                if name == "journal_mode" and result and str(result[0]).lower() != str(value).lower():
+                    logging.warning(f"SQLite journal_mode {value} is not available, using {result[0]}.")
 
     def create_table(self, table_name = 'documents'):
         with self.connection_lock:
@@ -35,32 +275,495 @@ class DocumentDatabase:
                     text_orig     TEXT NOT NULL,
                     title         TEXT NOT NULL,
                     filepath_orig TEXT,
-                    vdb_uuid      TEXT NOT NULL UNIQUE
+                    vdb_uuid      TEXT NOT NULL UNIQUE,
+                    content_hash  TEXT
                 );
                 """
             )
+
+            # Tables created before content hashing was introduced lack the column
+            columns = [row[1] for row in cursor.execute(f"PRAGMA table_info({table_name})")]
+            if "content_hash" not in columns:
+                cursor.execute(f"ALTER TABLE {table_name} ADD COLUMN content_hash TEXT")
+
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_{table_name}_content_hash ON {table_name} (content_hash)"
+            )
+            # Metadata filters of query(): category with a date range, date range alone
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_{table_name}_category_timestamp ON {table_name} (category, timestamp, id)"
+            )
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_{table_name}_timestamp ON {table_name} (timestamp, id)"
+            )
+            self._create_tags_table(cursor, table_name)
+            self._create_fts_table(cursor, table_name)
             self.connection.commit()
 
-    def add_document(self, document: Document, table_name = 'documents'):
-        with self.connection_lock:
-            cursor = self.connection.cursor()
-            data = document.model_dump()
-            data["tags"] = json.dumps(data["tags"])
-            data["langs"] = json.dumps(data["langs"])
+    def _create_tags_table(self, cursor, table_name):
+        """
+        Creates the tag join table (one row per document and tag), so that documents can
+        be filtered by tag through an index instead of parsing the JSON tags column.
+        Triggers fill it from the tags column with json_each.
+        """
+        tags_table = f"{table_name}_tags"
+        exists = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (tags_table,)
+        ).fetchone()
+        if exists:
+            return
+
+        cursor.executescript(
+            f"""
+            CREATE TABLE {tags_table} (
+                tag     TEXT NOT NULL COLLATE NOCASE,
+                doc_id  INTEGER NOT NULL,
+                PRIMARY KEY (tag, doc_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX idx_{tags_table}_doc_id ON {tags_table} (doc_id);
+
+            CREATE TRIGGER IF NOT EXISTS {tags_table}_insert AFTER INSERT ON {table_name} BEGIN
+                INSERT OR IGNORE INTO {tags_table} (tag, doc_id) SELECT value, new.id FROM json_each(new.tags);
+            END;
+            CREATE TRIGGER IF NOT EXISTS {tags_table}_delete AFTER DELETE ON {table_name} BEGIN
+                DELETE FROM {tags_table} WHERE doc_id = old.id;
+            END;
+            CREATE TRIGGER IF NOT EXISTS {tags_table}_update AFTER UPDATE OF tags ON {table_name} BEGIN
+                DELETE FROM {tags_table} WHERE doc_id = old.id;
+                INSERT OR IGNORE INTO {tags_table} (tag, doc_id) SELECT value, new.id FROM json_each(new.tags);
+            END;
+            """
+        )
+        # Tags of the documents stored before the table existed
+        cursor.execute(
+            f"""
+            INSERT OR IGNORE INTO {tags_table} (tag, doc_id)
+            SELECT json_each.value, d.id FROM {table_name} AS d, json_each(d.tags)
+            WHERE json_valid(d.tags)
+            """
+        )
+
+    def _create_fts_table(self, cursor, table_name):
+        """
+        Creates the FTS5 index over the text columns of the documents table. It is an
+        external-content table: it stores only the index and reads the column values
+        from the documents table, and triggers keep it in sync on every change.
+        """
+        fts_table = f"{table_name}_fts"
+        exists = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (fts_table,)
+        ).fetchone()
+        if exists:
+            return
 
+        try:
             cursor.execute(
                 f"""
-                INSERT INTO {table_name} (
-                    title, summary, text, text_orig, category,
-                    filepath, tags, timestamp, langs, filepath_orig, vdb_uuid
+                CREATE VIRTUAL TABLE {fts_table} USING fts5(
+                    {", ".join(FTS_COLUMNS)},
+                    content='{table_name}', content_rowid='id',
+                    tokenize='unicode61 remove_diacritics 2'
                 )
-                VALUES (
-                    :title, :summary, :text, :text_orig, :category,
-                    :filepath, :tags, :timestamp, :langs, :filepath_orig, :uuid
+                """
+            )
+        except sqlite3.OperationalError as e:
+            logging.warning(f"SQLite was built without FTS5, full-text search is disabled: {e}")
+            return
+
+        columns = ", ".join(FTS_COLUMNS)
+        new_values = ", ".join(f"new.{column}" for column in FTS_COLUMNS)
+        old_values = ", ".join(f"old.{column}" for column in FTS_COLUMNS)
+        cursor.executescript(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS {fts_table}_insert AFTER INSERT ON {table_name} BEGIN
+                INSERT INTO {fts_table} (rowid, {columns}) VALUES (new.id, {new_values});
+            END;
+            CREATE TRIGGER IF NOT EXISTS {fts_table}_delete AFTER DELETE ON {table_name} BEGIN
+                INSERT INTO {fts_table} ({fts_table}, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+            END;
+            CREATE TRIGGER IF NOT EXISTS {fts_table}_update AFTER UPDATE ON {table_name} BEGIN
+                INSERT INTO {fts_table} ({fts_table}, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+                INSERT INTO {fts_table} (rowid, {columns}) VALUES (new.id, {new_values});
+            END;
+            """
+        )
+        # Index the documents that were stored before full-text search was introduced
+        cursor.execute(f"INSERT INTO {fts_table} ({fts_table}) VALUES ('rebuild')")
+
+    def search(self, query: str, limit: int = 10, table_name = 'documents', raw: bool = False) -> List[dict]:
+        """
+        Full-text search over title, summary, text, original text and tags, ranked by
+        BM25 (matches in the title and tags weigh more than matches in the body).
+
+        By default every word of `query` has to occur in the document, and words that
+        contain punctuation are matched as written, so invoice numbers such as
+        'INV-2023-0042' or IBANs work as they are typed.
+
+        :param query: Search terms.
+        :param limit: Maximum number of results.
+        :param raw: Pass `query` to FTS5 unchanged, to use its syntax (OR, NEAR, prefix*, column:term).
+        :return: list - Dicts with id, title, category, filepath, timestamp, vdb_uuid, snippet and score
+            (lower is better), best match first.
+        """
+        match = query if raw else fts_query(query)
+        if not match:
+            return []
+
+        fts_table = f"{table_name}_fts"
+        weights = ", ".join(str(FTS_WEIGHTS[column]) for column in FTS_COLUMNS)
+        with self.read_connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(
+                f"""
+                SELECT d.id, d.title, d.category, d.filepath, d.timestamp, d.vdb_uuid,
+                       snippet({fts_table}, -1, '[', ']', '…', 16) AS snippet,
+                       bm25({fts_table}, {weights}) AS score
+                FROM {fts_table}
+                JOIN {table_name} AS d ON d.id = {fts_table}.rowid
+                WHERE {fts_table} MATCH ?
+                ORDER BY score
+                LIMIT ?
+                """,
+                (match, limit),
+            )
+            names = [column[0] for column in cursor.description]
+            return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+    def has_content_hash(self, content_hash: str, table_name = 'documents') -> bool:
+        """
+        Checks whether a file with the given content hash has already been ingested.
+        """
+        with self.read_connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(
+                f"SELECT 1 FROM {table_name} WHERE content_hash = ? LIMIT 1",
+                (content_hash,),
+            )
+            return cursor.fetchone() is not None
+
+    def query(self, category: str = None, since=None, until=None, tags: List[str] = None, limit: int = 50,
+              cursor: str = None, table_name = 'documents') -> Tuple[List[dict], str | None]:
+        """
+        Lists documents by metadata, newest first, one page at a time. Pages are read
+        with keyset pagination (continuing after the last timestamp and id), so late
+        pages cost the same as the first one however large the archive grows.
+
+        :param category: Only documents of this category.
+        :param since: Only documents with a timestamp at or after this date/datetime (or ISO string).
+        :param until: Only documents with a timestamp before this date/datetime (or ISO string).
+        :param tags: Only documents that have all of these tags (case-insensitive).
+        :param limit: Maximum number of documents per page.
+        :param cursor: The cursor returned with the previous page, or None for the first page.
+        :return: tuple - (documents as dicts, cursor of the next page or None if this was the last page)
+        """
+        conditions = []
+        params = []
+        if category is not None:
+            conditions.append("category = ?")
+            params.append(category)
+        if since is not None:
+            conditions.append("timestamp >= ?")
+            params.append(_sql_timestamp(since))
+        if until is not None:
+            conditions.append("timestamp < ?")
+            params.append(_sql_timestamp(until))
+        if tags:
+            # Deduplicate the way the NOCASE tag column compares, or the HAVING count can never be reached.
+            # NOCASE folds only ASCII letters, as bytes.lower() does.
+            unique_tags = {}
+            for tag in tags:
+                unique_tags.setdefault(tag.encode().lower(), tag)
+            tags = list(unique_tags.values())
+            placeholders = ", ".join("?" for _ in tags)
+            conditions.append(
+                f"id IN (SELECT doc_id FROM {table_name}_tags WHERE tag IN ({placeholders}) "
+                f"GROUP BY doc_id HAVING COUNT(*) = ?)"
+            )
+            params.extend(tags)
+            params.append(len(tags))
+        if cursor is not None:
+            last_timestamp, last_id = json.loads(cursor)
+            conditions.append("(timestamp, id) < (?, ?)")
+            params.extend([last_timestamp, last_id])
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self.read_connection() as connection:
+            db_cursor = connection.cursor()
+            db_cursor.execute(
+                f"""
+                SELECT id, title, summary, category, filepath, tags, timestamp, langs, vdb_uuid
+                FROM {table_name}
+                {where}
+                ORDER BY timestamp DESC, id DESC
+                LIMIT ?
+                """,
+                (*params, limit + 1),
+            )
+            names = [column[0] for column in db_cursor.description]
+            rows = [dict(zip(names, row)) for row in db_cursor.fetchall()]
+
+        # One extra row tells whether there is a next page
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = json.dumps([rows[-1]["timestamp"], rows[-1]["id"]])
+        for row in rows:
+            row["tags"] = json.loads(row["tags"])
+            row["langs"] = json.loads(row["langs"])
+        return rows, next_cursor
+
+    def iter_documents(self, after_id: int = 0, page_size: int = 500, table_name = 'documents'):
+        """
+        Streams all documents in id order, reading one keyset page (id > last id) at a
+        time, so memory use stays flat and a run can resume after any id.
+
+        :param after_id: Only documents with a larger id.
+        :param page_size: Number of rows read per query.
+        :return: Iterator of pages, each a list of dicts with all columns (tags and langs parsed).
+        """
+        while True:
+            with self.read_connection() as connection:
+                cursor = connection.execute(
+                    f"SELECT * FROM {table_name} WHERE id > ? ORDER BY id LIMIT ?", (after_id, page_size)
                 )
+                names = [column[0] for column in cursor.description]
+                rows = [dict(zip(names, row)) for row in cursor.fetchall()]
+            if not rows:
+                return
+
+            for row in rows:
+                row["tags"] = json.loads(row["tags"])
+                row["langs"] = json.loads(row["langs"])
+            yield rows
+            after_id = rows[-1]["id"]
+
+    def count_documents(self, after_id: int = 0, table_name = 'documents') -> int:
+        with self.read_connection() as connection:
+            return connection.execute(f"SELECT COUNT(*) FROM {table_name} WHERE id > ?", (after_id,)).fetchone()[0]
+
+    def create_manifest_table(self, table_name = 'scan_manifest'):
+        """
+        Creates the scan manifest, which remembers the stat of every file that was
+        already handled so that rescans can skip unchanged files.
+        """
+        with self.connection_lock:
+            cursor = self.connection.cursor()
+            cursor.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS {table_name} (
+                    path       TEXT PRIMARY KEY,
+                    size       INTEGER NOT NULL,
+                    mtime_ns   INTEGER NOT NULL,
+                    inode      INTEGER NOT NULL,
+                    status     TEXT NOT NULL,
+                    updated_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+                );
+                """
+            )
+            self.connection.commit()
+
+    def load_manifest(self, exclude_status=("failed",), table_name = 'scan_manifest') -> dict:
+        """
+        Loads the scan manifest into memory.
+
+        :param exclude_status: Statuses to leave out, so that those files are picked up again.
+        :return: dict - {path: (size, mtime_ns, inode)}
+        """
+        with self.read_connection() as connection:
+            cursor = connection.cursor()
+            placeholders = ", ".join("?" for _ in exclude_status)
+            cursor.execute(
+                f"SELECT path, size, mtime_ns, inode FROM {table_name}"
+                + (f" WHERE status NOT IN ({placeholders})" if exclude_status else ""),
+                tuple(exclude_status),
+            )
+            return {path: (size, mtime_ns, inode) for path, size, mtime_ns, inode in cursor}
+
+    def update_manifest(self, path: str, size: int, mtime_ns: int, inode: int, status: str, table_name = 'scan_manifest'):
+        """
+        Records the stat of a handled file in the scan manifest.
+        """
+        with self.connection_lock:
+            cursor = self.connection.cursor()
+            cursor.execute(
+                f"""
+                INSERT INTO {table_name} (path, size, mtime_ns, inode, status, updated_at)
+                VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(path) DO UPDATE SET
+                    size = excluded.size, mtime_ns = excluded.mtime_ns, inode = excluded.inode,
+                    status = excluded.status, updated_at = excluded.updated_at
                 """,
-                data,
+                (path, size, mtime_ns, inode, status),
             )
+            self.connection.commit()
+
+    @staticmethod
+    def _document_row(document: Document) -> dict:
+        data = document.model_dump()
+        data["tags"] = json.dumps(data["tags"])
+        data["langs"] = json.dumps(data["langs"])
+        return data
+
+    def add_document(self, document: Document, table_name = 'documents'):
+        with self.connection_lock:
+            cursor = self.connection.cursor()
+            cursor.execute(_INSERT_DOCUMENT_SQL.format(table_name=table_name), self._document_row(document))
             last_row_id = cursor.lastrowid
             self.connection.commit()
             return last_row_id
+
+    def add_documents(self, documents: List[Document], table_name = 'documents') -> List[int]:
+        """
+        Inserts several documents with one executemany call in a single transaction,
+        so the batch costs one commit instead of one per row. If any row violates a
+        constraint (e.g. a duplicate vdb_uuid), the whole batch is rolled back and the
+        sqlite3.IntegrityError is raised.
+
+        :return: list - The row ids, in the order of `documents`.
+        """
+        if not documents:
+            return []
+
+        rows = [self._document_row(document) for document in documents]
+        with self.connection_lock:
+            cursor = self.connection.cursor()
+            try:
+                cursor.executemany(_INSERT_DOCUMENT_SQL.format(table_name=table_name), rows)
+                # executemany does not report the row ids, look them up by the unique vdb_uuid
+                uuids = [row["uuid"] for row in rows]
+                ids = {}
+                for start in range(0, len(uuids), 500):
+                    batch = uuids[start:start + 500]
+                    placeholders = ", ".join("?" for _ in batch)
+                    cursor.execute(f"SELECT vdb_uuid, id FROM {table_name} WHERE vdb_uuid IN ({placeholders})", batch)
+                    ids.update(cursor.fetchall())
+                self.connection.commit()
+            except Exception:
+                self.connection.rollback()
+                raise
+            return [ids[uuid] for uuid in uuids]
+
+
+class GroupCommitWriter:
+    """
+    Collects documents submitted by concurrent workers and inserts them together with
+    DocumentDatabase.add_documents, once `max_rows` documents are waiting or the oldest
+    one has waited `max_delay_ms` milliseconds. Every submit returns a Future that
+    resolves to the row id once the group is committed.
+
+    Documents submitted while a group is being committed form the next group, so even
+    with `max_delay_ms=0` concurrent workers share one transaction and one commit
+    instead of queueing on the connection lock for a commit each. A delay above zero
+    gathers larger groups, which pays off when callers do not wait for their result.
+    """
+
+    def __init__(self, db: DocumentDatabase, table_name: str = 'documents', max_rows: int = 64,
+                 max_delay_ms: float = 0):
+        """
+        :param db: Database to write to.
+        :param table_name: Name of the documents table.
+        :param max_rows: Number of waiting documents that triggers a commit.
+        :param max_delay_ms: Maximum time a document waits for its group to fill up.
+        """
+        if max_rows < 1:
+            raise ValueError("max_rows must be at least 1.")
+
+        self.db = db
+        self.table_name = table_name
+        self.max_rows = max_rows
+        self.max_delay = max_delay_ms / 1000
+
+        self._pending = []  # (document, future)
+        self._oldest = None
+        self._condition = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="sqlite-group-commit", daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def from_config(cls, db: DocumentDatabase, config: dict):
+        """
+        Creates a writer from the SQLITE_GROUP_COMMIT_* configuration keys, or returns
+        None if SQLITE_GROUP_COMMIT_ROWS is not set.
+        """
+        if not config.get("SQLITE_GROUP_COMMIT_ROWS"):
+            return None
+        return cls(
+            db,
+            config.get("SQLITE_TABLE_NAME", "documents"),
+            max_rows=config["SQLITE_GROUP_COMMIT_ROWS"],
+            max_delay_ms=config.get("SQLITE_GROUP_COMMIT_MS", 0),
+        )
+
+    def submit(self, document: Document) -> Future:
+        """
+        Queues a document for the next group commit.
+
+        :return: Future - Resolves to the row id, or raises the insert error (e.g. sqlite3.IntegrityError).
+        """
+        future = Future()
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("GroupCommitWriter is closed.")
+            if not self._pending:
+                self._oldest = time.monotonic()
+            self._pending.append((document, future))
+            self._condition.notify()
+        return future
+
+    def add_document(self, document: Document) -> int:
+        """
+        Submits a document and waits until it is committed.
+        """
+        return self.submit(document).result()
+
+    def close(self):
+        """
+        Commits the documents that are still waiting and stops the writer thread.
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while True:
+                    if self._pending and (
+                        self._closed
+                        or len(self._pending) >= self.max_rows
+                        or time.monotonic() - self._oldest >= self.max_delay
+                    ):
+                        break
+                    if self._closed:
+                        return
+                    timeout = self._oldest + self.max_delay - time.monotonic() if self._pending else None
+                    self._condition.wait(timeout)
+                group, self._pending = self._pending[:self.max_rows], self._pending[self.max_rows:]
+                self._oldest = time.monotonic() if self._pending else None
+
+            self._commit(group)
+
+    def _commit(self, group: list):
+        documents = [document for document, _ in group]
+        try:
+            row_ids = self.db.add_documents(documents, self.table_name)
+        except sqlite3.IntegrityError:
+            # One bad row rolled back the whole group; insert one by one so only it fails
+            self._commit_each(group)
+            return
+        except Exception as e:
+            for _, future in group:
+                future.set_exception(e)
+            return
+
+        for (_, future), row_id in zip(group, row_ids):
+            future.set_result(row_id)
+
+    def _commit_each(self, group: list):
+        for document, future in group:
+            try:
+                future.set_result(self.db.add_document(document, self.table_name))
+            except Exception as e:
+                future.set_exception(e)
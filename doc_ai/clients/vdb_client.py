@@ -1,24 +1,110 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import weaviate
-from weaviate.classes.config import Configure
+from weaviate.classes.config import Configure, DataType, Property, Tokenization
+from weaviate.classes.query import Filter, GroupBy, MetadataQuery
+from weaviate.util import generate_uuid5
 from doc_ai.configs.models import Document
 from langchain_weaviate.vectorstores import WeaviateVectorStore
 from langchain_ollama import OllamaEmbeddings
 from langchain_ollama.llms import OllamaLLM
+from langchain_core.embeddings import Embeddings
+from doc_ai.clients.embedding_cache import CachedEmbeddings, embeddings_from_config
+from doc_ai.clients.search_cache import SearchResultCache
+from doc_ai.utils.text_splitter import split_passages
+
+# Named vector of the collection (see create_collection)
+VECTOR_NAME = "title_vector"
+EMBEDDING_MODEL = "nomic-embed-text"
 
 class VdbClient:
-    def __init__(self, collection_name="Documents"):
-        """Initialize the Weaviate client."""
+    def __init__(self, collection_name="Documents", batch_size: int = 100, flush_seconds: float = 2.0,
+                 on_failed_objects=None, embeddings: Embeddings = None, passages: bool = False,
+                 passage_chars: int = 1500, passage_overlap_chars: int = 200, embedding_batch_size: int = 32,
+                 embedding_workers: int = 4, search_cache: SearchResultCache = None, max_flush_retries: int = 3):
+        """
+        Initialize the Weaviate client. The connection stays open until close().
+
+        Documents added with add_document_vdb are buffered and written in one batch once
+        `batch_size` documents are waiting or the oldest has waited `flush_seconds`.
+
+        :param collection_name: Name of the Weaviate collection.
+        :param batch_size: Number of buffered documents that triggers a write.
+        :param flush_seconds: Maximum time a document stays in the buffer.
+        :param on_failed_objects: Called with the uuids of the documents that a flush could not write.
+        :param embeddings: Embeddings used for documents and queries, an in-memory CachedEmbeddings of
+            nomic-embed-text if not given. Vectors are computed client-side and sent with the objects.
+        :param passages: Also store every document as overlapping passages in the `{collection_name}Passages`
+            collection, linked to the document by parent_uuid and db_id (see search_passages).
+        :param passage_chars: Maximum length of a passage.
+        :param passage_overlap_chars: Length of the text a passage repeats from the previous one.
+        :param embedding_batch_size: Number of texts per embedding call.
+        :param embedding_workers: Number of embedding calls run in parallel.
+        :param search_cache: Cache for search results, invalidated whenever documents are written or deleted.
+        :param max_flush_retries: Number of times a batch is retried after the write raised (e.g. Weaviate
+            unreachable) before its documents are reported as failed.
+        """
         self.client = weaviate.connect_to_local()
         self.model = OllamaLLM(model="llama3.2")
         self.collection_name = collection_name
-        self.embeddings = OllamaEmbeddings(model='nomic-embed-text')
+        if embeddings is None:
+            embeddings = CachedEmbeddings(OllamaEmbeddings(model=EMBEDDING_MODEL), EMBEDDING_MODEL)
+        self.embeddings = embeddings
+
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.on_failed_objects = on_failed_objects
+        self.failed_objects = []  # uuids of the documents that could not be written
+        self.max_flush_retries = max_flush_retries
+        self._failed_flushes = 0
+        self._buffer = []  # (properties, uuid)
+        self._buffer_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flush_timer = None
+
+        self.passages = passages
+        self.passage_collection_name = f"{collection_name}Passages"
+        self.passage_chars = passage_chars
+        self.passage_overlap_chars = passage_overlap_chars
+        self._passage_collection_ready = False
+        self._passage_lock = threading.Lock()
+        self.embedding_batch_size = embedding_batch_size
+        self.embedding_workers = embedding_workers
+        self.search_cache = search_cache
+        self._vector_store = None
+
+    @classmethod
+    def from_config(cls, config: dict, collection_name="Documents"):
+        """
+        Creates a client with the VDB_* batching and EMBEDDING_* cache configuration keys.
+        """
+        return cls(
+            collection_name,
+            batch_size=config.get("VDB_BATCH_SIZE", 100),
+            flush_seconds=config.get("VDB_FLUSH_SECONDS", 2.0),
+            embeddings=embeddings_from_config(config),
+            passages=config.get("VDB_PASSAGES", False),
+            passage_chars=config.get("PASSAGE_CHARS", 1500),
+            passage_overlap_chars=config.get("PASSAGE_OVERLAP_CHARS", 200),
+            embedding_batch_size=config.get("EMBEDDING_BATCH_SIZE", 32),
+            embedding_workers=config.get("EMBEDDING_WORKERS", 4),
+            search_cache=SearchResultCache.from_config(config),
+        )
+
+    def _connect(self):
+        # Reconnect once if the connection was closed or dropped
+        if not self.client.is_connected():
+            self.client.connect()
 
     def create_collection(self):
         """Create a new collection."""
+        self._connect()
         self.client.collections.create(
             name=self.collection_name,
             vectorizer_config=Configure.Vectorizer.text2vec_ollama(     # Configure the Ollama embedding integration
-                name="title_vector",
+                name=VECTOR_NAME,
                 source_properties=["text"],
                 api_endpoint="http://host.docker.internal:11434",       # Allow Weaviate from within a Docker container to contact your Ollama instance
                 model="nomic-embed-text",                               # The model to use
@@ -29,54 +115,327 @@ class VdbClient:
             )
         )
 
-        self.client.close()  # Free up resources
+        if self.passages:
+            self.create_passage_collection()
+
+    def create_passage_collection(self):
+        """
+        Create the passage collection if it does not exist yet. Called on the first passage
+        write too, so enabling VDB_PASSAGES on an existing install needs no manual step.
+        """
+        self._connect()
+        with self._passage_lock:
+            if self._passage_collection_ready:
+                return
+            if not self.client.collections.exists(self.passage_collection_name):
+                logging.info(f"Creating the passage collection '{self.passage_collection_name}'.")
+                self.client.collections.create(
+                    name=self.passage_collection_name,
+                    properties=[
+                        Property(name="text", data_type=DataType.TEXT),
+                        Property(name="title", data_type=DataType.TEXT),
+                        # Field tokenization keeps the uuid whole; word tokenization would split it on '-'
+                        # and let filters and GroupBy match passages of other documents
+                        Property(name="parent_uuid", data_type=DataType.TEXT, tokenization=Tokenization.FIELD),
+                        Property(name="db_id", data_type=DataType.INT),
+                        Property(name="passage_index", data_type=DataType.INT),
+                    ],
+                    vectorizer_config=Configure.Vectorizer.text2vec_ollama(
+                        name=VECTOR_NAME,
+                        source_properties=["text"],
+                        api_endpoint="http://host.docker.internal:11434",
+                        model="nomic-embed-text",
+                    ),
+                )
+            else:
+                self._check_passage_collection()
+            self._passage_collection_ready = True
+
+    def _check_passage_collection(self):
+        # Passage collections created before parent_uuid was field-tokenized cannot be changed in place
+        config = self.client.collections.get(self.passage_collection_name).config.get()
+        for prop in config.properties:
+            if prop.name == "parent_uuid" and prop.tokenization != Tokenization.FIELD:
+                logging.error(
+                    f"'{self.passage_collection_name}.parent_uuid' is not field-tokenized, so deleting a document "
+                    f"can delete passages of others. Recreate the collections with 'python reindex.py --recreate'."
+                )
 
     def delete_collection(self):
         """Delete a collection."""
+        self._connect()
         self.client.collections.delete(self.collection_name)
-        self.client.close()
+        if self.passages:
+            self.client.collections.delete(self.passage_collection_name)
+            self._passage_collection_ready = False
+        self._invalidate_searches()
 
     def add_document_vdb(self, document: Document, last_row_id: int = None):
-        """Add a document to Weaviate."""
-        self.client.connect()
-        collection = self.client.collections.get(self.collection_name)
+        """
+        Add a document to Weaviate. The document is buffered and written with the next
+        batch (see flush); it is searchable after at most `flush_seconds`.
+        """
+        with self._buffer_lock:
+            # because of the variation in LLM interpretation of data, we use only original text ofr UUID generation.
+            self._buffer.append((self.make_properties(document, last_row_id), document.uuid))
+            full = len(self._buffer) >= self.batch_size
+            if not full:
+                self._start_flush_timer()
+
+        self._invalidate_searches()
+        if full:
+            self.flush()
+
+    def _start_flush_timer(self):
+        # Called with _buffer_lock held
+        if self._flush_timer is None:
+            self._flush_timer = threading.Timer(self.flush_seconds, self._flush_from_timer)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def _flush_from_timer(self):
+        # Nobody receives the result or an exception of a timer thread, so log them here
+        try:
+            self.flush()
+        except Exception as e:
+            logging.error(f"Timed flush to Weaviate failed: {e}")
+
+    @staticmethod
+    def make_properties(document: Document, last_row_id: int = None) -> dict:
+        """Properties of the Weaviate object of a document."""
         data = document.model_dump()
 
         # add title to search term text
         data['text'] = data['title']  + "\n\n" + data['text']
         data['db_id'] = last_row_id
+        return data
 
-        with collection.batch.dynamic() as batch:
-            # because of the variation in LLM interpretation of data, we use only original text ofr UUID generation.
-            batch.add_object(
-                properties=data,
-                uuid=document.uuid
-            )
+    def _invalidate_searches(self):
+        if self.search_cache is not None:
+            self.search_cache.invalidate()
+
+    def _cached_search(self, kind: str, query: str, k: int, compute, filters: dict = None):
+        if self.search_cache is None:
+            return compute()
+        return self.search_cache.get_or_compute(SearchResultCache.make_key(kind, query, k, filters), compute)
+
+    def flush(self) -> list:
+        """
+        Writes the buffered documents to Weaviate in one batch.
+
+        If the write raises, the documents go back into the buffer and are retried with
+        the next flush. After `max_flush_retries` failed flushes in a row they are given up.
+        Documents that were rejected or given up are added to `failed_objects` and passed
+        to `on_failed_objects`.
+
+        :return: list - The uuids of the documents that could not be written (empty if all were written or are retried).
+        """
+        with self._flush_lock:
+            with self._buffer_lock:
+                objects, self._buffer = self._buffer, []
+                if self._flush_timer is not None:
+                    self._flush_timer.cancel()
+                    self._flush_timer = None
+            if not objects:
+                return []
 
-        self.client.close()
+            try:
+                failed = self.write_objects(objects)
+                self._failed_flushes = 0
+            except Exception as e:
+                self._failed_flushes += 1
+                if self._failed_flushes <= self.max_flush_retries:
+                    logging.error(
+                        f"Writing {len(objects)} documents to Weaviate failed (attempt {self._failed_flushes}), "
+                        f"retrying with the next flush: {e}"
+                    )
+                    with self._buffer_lock:
+                        self._buffer[:0] = objects
+                        self._start_flush_timer()
+                    return []
+                logging.error(f"Writing {len(objects)} documents to Weaviate failed, giving up: {e}")
+                self._failed_flushes = 0
+                failed = [str(uuid) for _, uuid in objects]
+
+        if failed:
+            self.failed_objects.extend(failed)
+            if self.on_failed_objects is not None:
+                self.on_failed_objects(failed)
+        return failed
+
+    def write_objects(self, objects: list) -> list:
+        """
+        Embeds and writes objects to Weaviate in one batch, bypassing the buffer. Every
+        call uses its own collection handle and batch, so several calls can run in
+        parallel (see Reindexer).
+
+        :param objects: (properties, uuid) tuples, with properties from make_properties.
+        :return: list - The uuids of the documents that Weaviate rejected (or whose passages it rejected).
+        """
+        start = time.perf_counter()
+        vectors = self._embed_objects(objects)
+        self._connect()
+        collection = self.client.collections.get(self.collection_name)
+        with collection.batch.fixed_size(batch_size=len(objects)) as batch:
+            for (properties, uuid), vector in zip(objects, vectors):
+                batch.add_object(
+                    properties=properties,
+                    uuid=uuid,
+                    vector={VECTOR_NAME: vector} if vector is not None else None,
+                )
+
+        failed_objects = list(collection.batch.failed_objects)
+        if self.passages:
+            failed_objects.extend(self._write_passages(objects))
+        # Searches cached while the documents were buffered do not contain them
+        self._invalidate_searches()
+        logging.info(
+            f"Wrote {len(objects)} documents to Weaviate with {len(failed_objects)} failed objects "
+            f"in {time.perf_counter() - start:.2f}s."
+        )
+
+        failed = {}
+        for failed_object in failed_objects:
+            # A failed passage counts as a failure of its document
+            uuid = (failed_object.object_.properties or {}).get("parent_uuid") or str(failed_object.object_.uuid)
+            logging.error(f"Failed to write document {uuid} to Weaviate: {failed_object.message}")
+            failed[uuid] = None
+        return list(failed)
 
     def get_all_objects(self, include_vector = False):
+        for item in self.iter_objects(include_vector):
+            print(item["properties"])
+            print(item["vector"])
+
+    def iter_objects(self, include_vector = False):
+        """
+        Streams all objects of the collection (paged by the Weaviate iterator).
+
+        :return: Iterator of dicts with uuid, properties and vector (None unless include_vector).
+        """
+        self._connect()
         collection = self.client.collections.get(self.collection_name)
 
         for item in collection.iterator(
                 include_vector=include_vector  # If using named vectors, you can specify ones to include e.g. ['title', 'body'], or True to include all
         ):
-            print(item.properties)
-            print(item.vector)
+            yield {"uuid": str(item.uuid), "properties": item.properties, "vector": item.vector if include_vector else None}
+
+    def _embed_objects(self, objects: list) -> list:
+        """
+        Embeds the text of the buffered objects. If that fails, the objects are sent
+        without vectors and Weaviate vectorizes them itself.
+        """
+        try:
+            return self.embed_texts([properties['text'] for properties, _ in objects])
+        except Exception as e:
+            logging.error(f"Embedding {len(objects)} texts failed, leaving it to Weaviate: {e}")
+            return [None] * len(objects)
+
+    def embed_texts(self, texts: list) -> list:
+        """
+        Embeds texts in batches of `embedding_batch_size`, running up to `embedding_workers`
+        batches in parallel.
+        """
+        batches = [texts[i:i + self.embedding_batch_size] for i in range(0, len(texts), self.embedding_batch_size)]
+        if len(batches) <= 1 or self.embedding_workers <= 1:
+            return [vector for batch in batches for vector in self.embeddings.embed_documents(batch)]
+
+        with ThreadPoolExecutor(max_workers=min(self.embedding_workers, len(batches))) as executor:
+            return [vector for vectors in executor.map(self.embeddings.embed_documents, batches) for vector in vectors]
+
+    def make_passages(self, properties: dict, uuid: str) -> list:
+        """
+        Splits a document into overlapping passages.
+
+        :return: list - (properties, uuid) of every passage; the uuid is derived from the document uuid and the position.
+        """
+        passages = []
+        body = properties['text'][len(properties['title']) + 2:]
+        for index, passage in enumerate(split_passages(body, self.passage_chars, self.passage_overlap_chars)):
+            passages.append((
+                {
+                    # The title gives every passage the context of its document
+                    "text": f"{properties['title']}\n\n{passage}",
+                    "title": properties['title'],
+                    "parent_uuid": str(uuid),
+                    "db_id": properties['db_id'],
+                    "passage_index": index,
+                },
+                generate_uuid5(f"{uuid}:{index}"),
+            ))
+        return passages
+
+    def _write_passages(self, objects: list) -> list:
+        passages = [passage for properties, uuid in objects for passage in self.make_passages(properties, uuid)]
+        if not passages:
+            return []
+
+        vectors = self._embed_objects(passages)
+        self.create_passage_collection()
+        collection = self.client.collections.get(self.passage_collection_name)
+        with collection.batch.fixed_size(batch_size=min(len(passages), 200)) as batch:
+            for (properties, uuid), vector in zip(passages, vectors):
+                batch.add_object(
+                    properties=properties,
+                    uuid=uuid,
+                    vector={VECTOR_NAME: vector} if vector is not None else None,
+                )
+        return list(collection.batch.failed_objects)
 
     def search_documents(self, query: str):
         """Search for documents based on a query."""
-        self.client.connect()
-        collection = self.client.collections.get(self.collection_name)
+        def compute():
+            self._connect()
+            collection = self.client.collections.get(self.collection_name)
+            return collection.query.near_vector(
+                near_vector=self.embeddings.embed_query(query), target_vector=VECTOR_NAME, limit=3
+            )
 
-        try:
-            response = collection.query.near_text(query="food", limit=3)
+        return self._cached_search("search_documents", query, 3, compute)
 
-            return response
-        finally:
-            self.client.close()
+    def search_passages(self, query: str, limit: int = 5, passages_per_document: int = 3) -> list:
+        """
+        Searches the passages and groups the matches by their document, so that a document
+        is returned once with its best matching passages.
+
+        :param query: Search text.
+        :param limit: Maximum number of documents.
+        :param passages_per_document: Maximum number of passages returned per document.
+        :return: list - Dicts with parent_uuid, db_id, title, distance (of the best passage, lower
+            is better) and passages (texts, best first), best document first.
+        """
+        return self._cached_search(
+            "search_passages", query, limit,
+            lambda: self._search_passages(query, limit, passages_per_document),
+            {"passages_per_document": passages_per_document},
+        )
+
+    def _search_passages(self, query: str, limit: int, passages_per_document: int) -> list:
+        self._connect()
+        collection = self.client.collections.get(self.passage_collection_name)
+        response = collection.query.near_vector(
+            near_vector=self.embeddings.embed_query(query),
+            target_vector=VECTOR_NAME,
+            limit=limit * passages_per_document * 4,
+            group_by=GroupBy(prop="parent_uuid", objects_per_group=passages_per_document, number_of_groups=limit),
+            return_metadata=MetadataQuery(distance=True),
+        )
+
+        results = []
+        for group in response.groups.values():
+            best = group.objects[0].properties
+            results.append({
+                "parent_uuid": group.name,
+                "db_id": best.get("db_id"),
+                "title": best.get("title"),
+                "distance": group.min_distance,
+                "passages": [item.properties["text"] for item in group.objects],
+            })
+        return sorted(results, key=lambda result: result["distance"])
 
     def delete_objects(self, uuids_to_delete: list):
+        self._connect()
         collection = self.client.collections.get(self.collection_name)
         # Deleting objects by UUID
         for uuid in uuids_to_delete:
@@ -88,21 +447,43 @@ class VdbClient:
             except Exception as e:
                 print(f"Failed to delete object with UUID: {uuid}. Error: {str(e)}")
 
-        self.client.close()  # Free up resources
+        if self.passages and uuids_to_delete:
+            passages = self.client.collections.get(self.passage_collection_name)
+            # Exact matches, parent_uuid is field-tokenized
+            passages.data.delete_many(
+                where=Filter.by_property("parent_uuid").contains_any([str(uuid) for uuid in uuids_to_delete])
+            )
+        self._invalidate_searches()
 
     def get_weavaiate_class_object(self):
-        return WeaviateVectorStore.from_documents(
-            [],
-            self.embeddings,
-            client=self.client,
-            index_name=self.collection_name,
-        )
+        self._connect()
+        # Built once and reused, the client connection stays open
+        if self._vector_store is None:
+            self._vector_store = WeaviateVectorStore.from_documents(
+                [],
+                self.embeddings,
+                client=self.client,
+                index_name=self.collection_name,
+            )
+        return self._vector_store
 
     def langchain_search(self, query: str):
-        db = self.get_weavaiate_class_object()
-        docs = db.similarity_search_with_score(query, k=5)
-        self.client.close()
-        return docs
+        def compute():
+            db = self.get_weavaiate_class_object()
+            return db.similarity_search_with_score(query, k=5)
+
+        return self._cached_search("langchain_search", query, 5, compute)
 
     def close(self):
-        self.client.close()
+        """Writes the buffered documents (retrying failed batches right away) and closes the connection."""
+        try:
+            while self._buffer:
+                self.flush()
+        finally:
+            self.client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
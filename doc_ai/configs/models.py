@@ -29,6 +29,12 @@ class DocumentStructured(BaseModel):
 class DocumentStructuredTranslated(DocumentStructured):
     text_user_lang: str = Field(None, description="All of the document text translated into the users language.")
 
+class DocumentChunkSummary(BaseModel):
+    summary: str = Field(..., description="A summary of this part of the document in users language. Keep names, dates, amounts and reference numbers.")
+
+class DocumentChunkTranslated(DocumentChunkSummary):
+    text_user_lang: str = Field(..., description="All of the text of this part of the document translated into the users language.")
+
 class Document(BaseModel):
     uuid: str = Field(..., description="Unique identifier for the document in Vector Database.")
     title: str = Field(..., description="The title of the document in user language.")
@@ -40,4 +46,5 @@ class Document(BaseModel):
     timestamp: Optional[datetime] = Field(None,description="Timestamp of the document in ISO format, if it is available in the document. Else leave blank.")
     langs: List[str] = Field(description="The languages of the document.")
     filepath: str = Field(..., description="Define the proper filename for the document in users language without the file extension.")
-    filepath_orig: str = Field(..., description="The original file path of the document.")
\ No newline at end of file
+    filepath_orig: str = Field(..., description="The original file path of the document.")
+    content_hash: Optional[str] = Field(None, description="SHA-256 hash of the original file bytes.")
\ No newline at end of file
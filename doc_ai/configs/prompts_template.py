@@ -67,3 +67,75 @@ Provide back your response according to the format instructions that follow.
 You must provide response in json format without any extra text.
 {format_instructions}
 """
+
+PROCESS_CHUNK_PROMPT = """
+I would like you to examine the following part of a longer document carefully.
+This is part {chunk_number} of {chunk_count}.
+This document has text in the following languages: {document_languages}.
+The users language is {user_language}.
+You will be required to:
+ - create a summary of this part of the document in {user_language}
+The response format instructions specify how you should return your response, follow them carefully.
+
+# Document part:
+```
+{document_text}
+```
+
+# Response format instructions:
+Provide back your response according to the format instructions that follow.
+You must provide response in json format without any extra text.
+{format_instructions}
+"""
+
+PROCESS_TRANSLATE_CHUNK_PROMPT = """
+I would like you to examine the following part of a longer document carefully.
+This is part {chunk_number} of {chunk_count}.
+This document has text in the following languages: {document_languages}.
+The users language is {user_language}.
+You will be required to:
+ - translate this part of the document into {user_language}. Do not skip or shorten the text.
+ - create a summary of this part of the document in {user_language}
+The response format instructions specify how you should return your response, follow them carefully.
+
+# Document part:
+```
+{document_text}
+```
+
+# Response format instructions:
+Provide back your response according to the format instructions that follow.
+You must provide response in json format without any extra text.
+{format_instructions}
+"""
+
+PROCESS_REDUCE_DOC_PROMPT = """
+I would like you to examine the following document carefully.
+The document was too long to be provided in full, so you are given summaries of all of its parts, in order.
+This document has text in the following languages: {document_languages}.
+The users language is {user_language}.
+You will be required to:
+ - create a summary of the whole document in {user_language}
+ - create tags in {user_language}
+ - categorise the document into one of the following categories: {categories}. If document does not fit into any of these categories, create a new category for it.
+ - fit the document into the following directory structure: {dir_tree}. Creating new directories is allowed.
+The response format instructions specify how you should return your response, follow them carefully.
+
+# Important Notes:
+{common_instructions}
+
+# Beginning of the document:
+```
+{document_beginning}
+```
+
+# Summaries of the document parts:
+```
+{document_text}
+```
+
+# Response format instructions:
+Provide back your response according to the format instructions that follow.
+You must provide response in json format without any extra text.
+{format_instructions}
+"""
@@ -1,8 +1,12 @@
 from utils.general import load_config
 from utils.logger_setup import setup_logger
 from processors.directory_processor import DirectoryProcessor
+from processors.directory_watcher import DirectoryWatcher
 from doc_ai.clients.vdb_client import VdbClient
+from doc_ai.clients.local_vdb_client import LocalVdbClient
 from doc_ai.clients.bedrock_client import BedrockClient
+from doc_ai.clients.rate_limiter import LlmRateLimiter
+from doc_ai.clients.llm_cache import LlmCache
 
 # ------------------------------------------------------------------------
 # Configure Logging
@@ -22,12 +26,28 @@ def main():
     config_file = "configs/config.json"  # Path to the configuration file
     config = load_config(config_file)
 
-    vector_client = VdbClient()
-    vector_client.close()
-    llm_client = BedrockClient()
+    # One connection for the whole run; processor.close() writes the last buffered batch
+    if config.get("VECTOR_BACKEND", "weaviate") == "local":
+        vector_client = LocalVdbClient.from_config(config)
+    else:
+        vector_client = VdbClient.from_config(config)
+    llm_client = BedrockClient(
+        rate_limiter=LlmRateLimiter.from_config(config),
+        cache=LlmCache.from_config(config),
+    )
 
     processor = DirectoryProcessor(config, llm_client, vector_client)
-    processor.walk_through_directory()
+    try:
+        if config.get("WATCH_MODE", False):
+            # Long-running: reconciliation scan, then process files as they land
+            DirectoryWatcher.from_config(processor, config).run()
+        elif config.get("PIPELINE_ENABLED", False):
+            processor.walk_through_directory_pipelined()
+        else:
+            processor.walk_through_directory()
+    finally:
+        # Commits the last group of rows, writes the buffered vectors and closes the connections
+        processor.close()
 
 
 if __name__ == "__main__":
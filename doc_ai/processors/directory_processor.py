@@ -1,13 +1,17 @@
 import os
 import sqlite3
+import threading
 from pathlib import Path
 from pytz import timezone
-from doc_ai.clients.sqlite_client import DocumentDatabase
+from doc_ai.clients.sqlite_client import DocumentDatabase, GroupCommitWriter, pragmas_from_config
 from doc_ai.processors.document_processor import DocumentProcessor
-from doc_ai.configs.models import Document
-from doc_ai.utils.general import move_file, get_file_creation_time, generate_directory_tree, ALL_LANGUAGES
+from doc_ai.configs.models import Document, DocumentRaw, DocumentStructured
+from doc_ai.utils.general import move_file, get_file_creation_time, compute_file_hash, ALL_LANGUAGES
+from doc_ai.utils.dir_tree_index import DirectoryTreeIndex
 from weaviate.util import generate_uuid5
 from doc_ai.utils.items_manager import ItemsManager
+from doc_ai.processors.pipeline import IngestionPipeline
+from doc_ai.processors.manifest_scanner import ManifestScanner
 
 # Define the CET timezone
 cet_timezone = timezone("CET")
@@ -53,14 +57,60 @@ class DirectoryProcessor:
         """
         self.config = config
         self.user_lang = ALL_LANGUAGES[config['USER_LANGUAGE']]
-        self.dir_tree = generate_directory_tree(config.get("DIR_ORGANISED"))
+        # Built once, then updated in place when move_file creates directories
+        self.tree_index = DirectoryTreeIndex(config.get("DIR_ORGANISED"))
         self.target_directory = config.get("TARGET_DIRECTORY", "")
         self.extensions = config.get("EXTENSIONS", [])
         self.excluded_dirs = config.get("EXCLUDED_DIRECTORIES", [])
-        self.document_processor = DocumentProcessor(config, llm_client, self.dir_tree)
+        self.document_processor = DocumentProcessor(config, llm_client, self.tree_index)
         self.vs = vector_store_client
-        self.db = DocumentDatabase(f"{config['SQLDB_DB_PATH']}")
+        if getattr(self.vs, "on_failed_objects", False) is None:
+            self.vs.on_failed_objects = self.on_vector_store_failure
+        self.db = DocumentDatabase(
+            f"{config['SQLDB_DB_PATH']}", pragmas_from_config(config), config.get("SQLITE_READ_CONNECTIONS", 4)
+        )
+        # Makes sure the table has the columns and indexes used below (e.g. content_hash)
+        self.db.create_table(self.config['SQLITE_TABLE_NAME'])
+        # Batches the inserts of concurrent persist workers into shared commits (None if disabled)
+        self.db_writer = GroupCommitWriter.from_config(self.db, config)
         self.categories_manager = ItemsManager('CATEGORIES')
+        # Guards file moves and categories, which are shared between pipeline workers
+        self.state_lock = threading.Lock()
+        # Shared by the directory walk and the watcher, so both record the files they handle
+        self.scanner = None
+        if self.config.get("INCREMENTAL_SCAN", False):
+            self.db.create_manifest_table()
+            self.scanner = ManifestScanner(self.db, self.target_directory, self.extensions_normalized, self.excluded_dirs_lower)
+        self._closed = False
+
+    @property
+    def dir_tree(self) -> str:
+        """Directory tree of DIR_ORGANISED, rendered from the cached index."""
+        return self.tree_index.render()
+
+    @property
+    def extensions_normalized(self) -> list:
+        """Allowed extensions, lowercase with a leading dot, e.g. '.pdf'."""
+        return [
+            ext.lower() if ext.startswith('.') else f'.{ext.lower()}'
+            for ext in self.extensions
+        ]
+
+    @property
+    def excluded_dirs_lower(self) -> list:
+        return [d.lower() for d in self.excluded_dirs]
+
+    def is_excluded_dir(self, name: str) -> bool:
+        """
+        Returns True for directories that are not scanned: hidden ones and EXCLUDED_DIRECTORIES.
+        """
+        return name.startswith('.') or name.lower() in self.excluded_dirs_lower
+
+    def is_target_file(self, file_path: Path) -> bool:
+        """
+        Returns True if the file has one of the allowed EXTENSIONS.
+        """
+        return Path(file_path).suffix.lower() in self.extensions_normalized
 
     def validate_config(self):
         """
@@ -75,22 +125,20 @@ class DirectoryProcessor:
         if not isinstance(self.excluded_dirs, list):
             raise ValueError("EXCLUDED_DIRECTORIES must be a list of strings.")
 
-    def walk_through_directory(self):
+    def iter_target_files(self):
         """
         Walks through the target directory, filters out excluded directories,
-        processes files that match the allowed extensions, and invokes the
-        appropriate DocumentProcessor method (PDF, image, or text).
+        and yields the paths of files that match the allowed extensions.
         """
         self.validate_config()
 
-        # Normalize extensions to have a leading dot, e.g. '.pdf'
-        extensions_normalized = [
-            ext.lower() if ext.startswith('.') else f'.{ext.lower()}'
-            for ext in self.extensions
-        ]
-        excluded_dirs_lower = [d.lower() for d in self.excluded_dirs]
+        extensions_normalized = self.extensions_normalized
+        excluded_dirs_lower = self.excluded_dirs_lower
 
-        logging.debug(self.dir_tree)
+        # Only yield files that are new or changed since the last scan
+        if self.scanner is not None:
+            yield from self.scanner.iter_changed_files()
+            return
 
         for root, dirs, files in os.walk(self.target_directory, followlinks=False):
             # Exclude directories starting with a dot or in the excluded list
@@ -102,7 +150,6 @@ class DirectoryProcessor:
             for file in files:
                 file_path = Path(root) / file
                 file_extension = file_path.suffix.lower()
-                file_name = file_path.stem
 
                 # Skip files without an extension
                 if not file_extension:
@@ -111,115 +158,266 @@ class DirectoryProcessor:
 
                 # Check if file extension is in the allowed set
                 if file_extension in extensions_normalized:
-                    logging.info(f"""\n\n========== "{file_path}" ==========""")
-
-                    try:
-                        # Dispatch to the correct processor based on extension
-                        if file_extension.lower() in ['.jpeg', '.jpg', '.png']:
-                            document_original = self.document_processor.process_img(file_path)
-                        elif file_extension.lower() == '.pdf':
-                            document_original = self.document_processor.process_pdf(file_path)
-                    except Exception as e:
-                        logging.error(f"Error processing file '{file_path}': {e}")
-                        continue
-
-                    if not document_original:
-                        logging.error(f"Document is None: {file_path}")
-                        continue
-                    if not hasattr(document_original, "text") or len(document_original.text) < 10:
-                        logging.error(f"Document text is empty: {file_path}. Loaded text: {document_original.text}")
-                        continue
-
-                    logging.info(f"Loaded text length: {len(document_original.text)}")
-                    tokens = len(document_original.text)/4
-                    context_length = self.config.get("LLM_CONTEXT_LENGTH", 16000)
-                    if tokens > context_length:
-                        logging.error(f"Document length of {tokens} tokens exceeds context length of {context_length} tokens. Skipping.")
-                        continue
-
-                    # We use only original text ofr UUID generation.
-                    uuid = generate_uuid5({"text": document_original.text})
-                    logging.info(f"Generated UUID from the image text {uuid}")
-
-
-                    # Translate into Base Language
-                    logging.info(f"Translating to {self.user_lang} and summarizing.")
-                    try:
-                        document_structured = self.document_processor.process_document_text(document_original, self.user_lang)
-                        # Define the new directory of the document
-                        new_filename = remove_extension(document_structured.new_filename) + file_extension
-                        new_filepath = Path(document_structured.directory) / new_filename
-                    except Exception as e:
-                        logging.error(f"Error getting structured document: {e}")
-                        continue
-
-                    #logging.info(f"Original Document: {document_original.model_dump_json(indent=2)}")
-                    #logging.info(f"Structured Document: {document_structured.model_dump_json(indent=2)}")
-
-                    # Create a dictionary for the Document
-                    document_dict = {
-                        "uuid": uuid,
-                        "title": document_structured.title,
-                        "summary": document_structured.summary,
-                        "category": document_structured.category,
-                        "tags": document_structured.tags,
-                        "langs": document_original.langs,
-                        "filepath": str(new_filepath),
-                        "filepath_orig": str(file_path)
-                    }
-
-                    # If original document is in the same language as users language
-                    if len(document_original.langs) == 1 and document_original.langs[0] == self.user_lang:
-                        document_dict["text"] = document_original.text
-                    elif hasattr(document_structured, 'text_user_lang') and len(document_structured.text_user_lang) > 10:
-                        document_dict["text"] = document_structured.text_user_lang
-                        document_dict["text_orig"] = document_original.text
-                    else:
-                        exit("Error")
-
-                    # If timestamp is not available within the documents, use the file creation time
-                    if not hasattr(document_structured, 'timestamp') or not document_structured.timestamp:
-                        document_dict["timestamp"] = get_file_creation_time(file_path)
-                    else:
-                        document_dict["timestamp"] = document_structured.timestamp
-
-                    if document_dict["timestamp"].tzinfo is None:  # If naive, define it as CET
-                        document_dict["timestamp"] = cet_timezone.localize(document_dict["timestamp"])
-
-                    #logging.info(f"Document dictionary: {document_dict}")
-
-                    # Create and return the Document object from the dictionary
-                    try:
-                        document = Document(**document_dict)
-                    except Exception as e:
-                        logging.error(f"Failed to create Document object from dictionary: {e}. \n {document_dict} \n {document_dict}")
-
-                    # Insert original and translated document data into DB
-                    try:
-                        last_row_id = self.db.add_document(document, self.config['SQLITE_TABLE_NAME'])
-                    except sqlite3.IntegrityError as e:
-                        # Handle the UNIQUE constraint error
-                        logging.error(f"Duplicate: {file_path} already exists in the database. Skipping. Error: {e}")
-                        continue
-                    except Exception as e:
-                        logging.error("Failed to insert document %s:\n%s \n%s \n%s\n\n", file_path, document,  e)
-                        raise e
-
-                    # Insert into Vector Store database:
-                    self.vs.add_document_vdb(document, last_row_id)
-
-                    # Move the file to new directory (organizing)
-                    try:
-                        new_dir_tree = move_file(file_path, f"{self.config.get('DIR_ORGANISED')}/{document.filepath}", new_filename)
-                        if new_dir_tree:
-                            self.dir_tree = generate_directory_tree(self.config.get("DIR_ORGANISED"))
-                    except Exception as e:
-                        logging.error("Failed to move document:\n\n%s \n\n%s", document, e)
-                        raise e
-
-                    # Update categories with new values if needed:
-                    updated_categories = self.categories_manager.add_items([document_structured.category])
-                    if updated_categories:
-                        new_categories = self.categories_manager.add_items()
-                        logging.info(f"Added new category: {document_structured.category}")
-                        self.document_processor.categories = ", ".join(new_categories)
+                    yield file_path
+
+    def walk_through_directory(self):
+        """
+        Walks through the target directory and processes every matching file
+        one at a time (extraction, structuring and persistence in sequence).
+        """
+        logging.debug(self.dir_tree)
+
+        for file_path in self.iter_target_files():
+            self.process_file(file_path)
+
+    def walk_through_directory_pipelined(self):
+        """
+        Walks through the target directory and processes the matching files with
+        the staged concurrent pipeline. Worker counts per stage and the queue size
+        are taken from the configuration (see IngestionPipeline.from_config).
+
+        :return: dict - Per-stage counters collected by the pipeline.
+        """
+        logging.debug(self.dir_tree)
+
+        pipeline = IngestionPipeline.from_config(self, self.config)
+        return pipeline.run(self.iter_target_files())
+
+    def process_file(self, file_path: Path) -> bool:
+        """
+        Runs all processing stages for a single file.
+
+        :param file_path: Path to the file.
+        :return: bool - True if the document was stored and moved, False otherwise.
+        """
+        content_hash = self.fingerprint_file(file_path)
+        if content_hash is None:
+            return False
+
+        document_original = self.extract_document(file_path)
+        if document_original is None:
+            return False
+
+        structured = self.structure_document(file_path, document_original, content_hash)
+        if structured is None:
+            return False
+
+        return self.persist_document(file_path, *structured)
+
+    # ------------------------------------------------------------------------
+    # Processing stages
+    # ------------------------------------------------------------------------
+    def fingerprint_file(self, file_path: Path) -> str | None:
+        """
+        Stage 0 - hashes the file bytes and checks the hash against the database, so that
+        files that were already ingested are skipped before any extraction or LLM call.
+
+        :param file_path: Path to the file.
+        :return: str - The content hash, or None if the file is a duplicate or cannot be read.
+        """
+        # The first stage of every path (walk, pipeline, watcher): take the stat for the manifest
+        # now, a processed file is moved away before it is recorded
+        if self.scanner is not None:
+            self.scanner.remember(file_path)
+        try:
+            content_hash = compute_file_hash(file_path)
+        except OSError as e:
+            logging.error(f"Error hashing file '{file_path}': {e}")
+            return None
+
+        if self.db.has_content_hash(content_hash, self.config['SQLITE_TABLE_NAME']):
+            logging.info(f"Duplicate: {file_path} has already been ingested (content hash {content_hash}). Skipping.")
+            self.record_scan(file_path, "duplicate")
+            return None
+
+        return content_hash
+
+    def extract_document(self, file_path: Path) -> DocumentRaw | None:
+        """
+        Stage 1 - extracts the raw text and languages of the file (PDF reader, vision LLM or OCR).
+
+        :param file_path: Path to the file.
+        :return: DocumentRaw or None if nothing usable could be extracted.
+        """
+        logging.info(f"""\n\n========== "{file_path}" ==========""")
+        file_extension = file_path.suffix.lower()
+        document_original = None
+
+        try:
+            # Dispatch to the correct processor based on extension
+            if file_extension in ['.jpeg', '.jpg', '.png']:
+                document_original = self.document_processor.process_img(file_path)
+            elif file_extension == '.pdf':
+                document_original = self.document_processor.process_pdf(file_path)
+        except Exception as e:
+            logging.error(f"Error processing file '{file_path}': {e}")
+            return None
+
+        if not document_original:
+            logging.error(f"Document is None: {file_path}")
+            return None
+        if not hasattr(document_original, "text") or len(document_original.text) < 10:
+            logging.error(f"Document text is empty: {file_path}. Loaded text: {document_original.text}")
+            return None
+
+        logging.info(f"Loaded text length: {len(document_original.text)}")
+        return document_original
+
+    def structure_document(self, file_path: Path, document_original: DocumentRaw, content_hash: str = None):
+        """
+        Stage 2 - summarizes, tags, categorises and (if needed) translates the document with the LLM.
+
+        :param file_path: Path to the file.
+        :param document_original: DocumentRaw returned by extract_document.
+        :param content_hash: Hash of the file bytes returned by fingerprint_file.
+        :return: tuple (Document, DocumentStructured, new_filename) or None on failure.
+        """
+        file_extension = file_path.suffix.lower()
+
+        if not self.config.get("LLM_CHUNKING_ENABLED", True) and self.document_processor.exceeds_context_length(document_original):
+            context_length = self.config.get("LLM_CONTEXT_LENGTH", 16000)
+            logging.error(f"Document length of {len(document_original.text)/4} tokens exceeds context length of {context_length} tokens. Skipping.")
+            return None
+
+        # We use only original text ofr UUID generation.
+        uuid = generate_uuid5({"text": document_original.text})
+        logging.info(f"Generated UUID from the image text {uuid}")
+
+        # Translate into Base Language
+        logging.info(f"Translating to {self.user_lang} and summarizing.")
+        try:
+            document_structured = self.document_processor.process_document_text(document_original, self.user_lang)
+            # Define the new directory of the document
+            new_filename = remove_extension(document_structured.new_filename) + file_extension
+            new_filepath = Path(document_structured.directory) / new_filename
+        except Exception as e:
+            logging.error(f"Error getting structured document: {e}")
+            return None
+
+        # Create a dictionary for the Document
+        document_dict = {
+            "uuid": uuid,
+            "title": document_structured.title,
+            "summary": document_structured.summary,
+            "category": document_structured.category,
+            "tags": document_structured.tags,
+            "langs": document_original.langs,
+            "filepath": str(new_filepath),
+            "filepath_orig": str(file_path),
+            "content_hash": content_hash
+        }
+
+        # If original document is in the same language as users language
+        if len(document_original.langs) == 1 and document_original.langs[0] == self.user_lang:
+            document_dict["text"] = document_original.text
+        elif hasattr(document_structured, 'text_user_lang') and len(document_structured.text_user_lang) > 10:
+            document_dict["text"] = document_structured.text_user_lang
+            document_dict["text_orig"] = document_original.text
+        else:
+            logging.error(f"No text in {self.user_lang} was returned for: {file_path}. Skipping.")
+            return None
+
+        # If timestamp is not available within the documents, use the file creation time
+        if not hasattr(document_structured, 'timestamp') or not document_structured.timestamp:
+            document_dict["timestamp"] = get_file_creation_time(file_path)
+        else:
+            document_dict["timestamp"] = document_structured.timestamp
+
+        if document_dict["timestamp"].tzinfo is None:  # If naive, define it as CET
+            document_dict["timestamp"] = cet_timezone.localize(document_dict["timestamp"])
+
+        # Create and return the Document object from the dictionary
+        try:
+            document = Document(**document_dict)
+        except Exception as e:
+            logging.error(f"Failed to create Document object from dictionary: {e}. \n {document_dict}")
+            return None
+
+        return document, document_structured, new_filename
+
+    def persist_document(self, file_path: Path, document: Document, document_structured: DocumentStructured, new_filename: str) -> bool:
+        """
+        Stage 3 - stores the document in SQLite and the vector store, then moves the file
+        into the organised directory tree.
+
+        :return: bool - True if the document was stored and moved, False if it was a duplicate.
+        """
+        # Insert original and translated document data into DB
+        try:
+            if self.db_writer is not None:
+                last_row_id = self.db_writer.add_document(document)
+            else:
+                last_row_id = self.db.add_document(document, self.config['SQLITE_TABLE_NAME'])
+        except sqlite3.IntegrityError as e:
+            # Handle the UNIQUE constraint error
+            logging.error(f"Duplicate: {file_path} already exists in the database. Skipping. Error: {e}")
+            self.record_scan(file_path, "duplicate")
+            return False
+        except Exception as e:
+            logging.error("Failed to insert document %s:\n%s \n%s\n\n", file_path, document,  e)
+            raise e
+
+        # Insert into Vector Store database:
+        self.vs.add_document_vdb(document, last_row_id)
+
+        # Move the file to new directory (organizing)
+        with self.state_lock:
+            try:
+                new_location = f"{self.config.get('DIR_ORGANISED')}/{document.filepath}"
+                new_dir_tree = move_file(file_path, new_location, new_filename)
+                if new_dir_tree:
+                    self.tree_index.add_directory(new_location)
+            except Exception as e:
+                logging.error("Failed to move document:\n\n%s \n\n%s", document, e)
+                raise e
+
+            # Update categories with new values if needed:
+            updated_categories = self.categories_manager.add_items([document_structured.category])
+            if updated_categories:
+                new_categories = self.categories_manager.get_all_items()
+                logging.info(f"Added new category: {document_structured.category}")
+                self.document_processor.categories = ", ".join(new_categories)
+
+        self.record_scan(file_path, "processed")
+        return True
+
+    def close(self):
+        """
+        Shuts down the clients in dependency order: commits the documents still waiting in
+        the group commit writer, writes the buffered vectors, then closes the OCR pool, the
+        LLM response cache and the database (read pool and write connection). Calling it
+        again does nothing.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            if self.db_writer is not None:
+                self.db_writer.close()
+            self.vs.close()
+        finally:
+            self.document_processor.processor.close()
+            self.document_processor.llm.close()
+            self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def on_vector_store_failure(self, uuids: list):
+        """
+        Called by the vector store client with the uuids of documents it could not write.
+        They are stored in SQLite and moved already, so they are logged for a reindex.
+        """
+        for uuid in uuids:
+            logging.error(f"Document {uuid} is in the database but not in the vector store, write it with reindex.py --restart.")
+
+    def record_scan(self, file_path: Path, status: str):
+        """
+        Records a handled file in the scan manifest (incremental scans only), so that it
+        is skipped on the next scan unless it changes.
+        """
+        if self.scanner is not None:
+            self.scanner.record(file_path, status)
@@ -0,0 +1,231 @@
+import logging
+import os
+import time
+from pathlib import Path
+from doc_ai.utils.inotify import (
+    Inotify, IN_CLOSE_WRITE, IN_CREATE, IN_DELETE_SELF, IN_IGNORED, IN_ISDIR, IN_MODIFY,
+    IN_MOVED_FROM, IN_MOVED_TO, IN_MOVE_SELF, IN_ONLYDIR, IN_Q_OVERFLOW,
+)
+
+# Events watched on every directory of the target tree
+WATCH_MASK = (IN_CLOSE_WRITE | IN_MODIFY | IN_MOVED_TO | IN_MOVED_FROM | IN_CREATE
+              | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+
+# ------------------------------------------------------------------------
+# Continuous Ingestion
+# ------------------------------------------------------------------------
+class DirectoryWatcher:
+    """
+    Watches TARGET_DIRECTORY with inotify and processes new files as they land,
+    reusing the clients of a single DirectoryProcessor for the lifetime of the process.
+
+    A file is processed once it has been quiet (no write events and an unchanged size)
+    for `debounce_seconds`, so files that are still being copied are not picked up
+    half-written. On startup, and whenever the kernel event queue overflows, a
+    reconciliation scan processes everything that arrived while nothing was watching.
+
+    A file whose processing raises (e.g. a locked database or a failed move) is retried
+    with a growing delay, so one bad file never stops the watcher.
+    """
+
+    def __init__(self, directory_processor, debounce_seconds: float = 2.0, max_retries: int = 3):
+        """
+        :param directory_processor: DirectoryProcessor providing the scan and processing logic.
+        :param debounce_seconds: Time a file must stay unchanged before it is processed.
+        :param max_retries: Number of times a file is retried after its processing raised.
+        """
+        self.processor = directory_processor
+        self.debounce_seconds = debounce_seconds
+        self.max_retries = max_retries
+        self.retries = {}  # file path -> failed attempts so far
+        self.target_directory = os.path.abspath(directory_processor.target_directory)
+        dir_organised = directory_processor.config.get("DIR_ORGANISED")
+        # Files moved into the organised tree must not be picked up again
+        self.dir_organised = os.path.abspath(dir_organised) if dir_organised else None
+
+        self.inotify = None
+        self.watches = {}  # watch descriptor -> directory path
+        self.pending = {}  # file path -> (time of the last event, size at that time)
+        self._running = False
+
+    @classmethod
+    def from_config(cls, directory_processor, config: dict):
+        """
+        Creates a watcher from the WATCH_* configuration keys.
+        """
+        return cls(directory_processor, debounce_seconds=config.get("WATCH_DEBOUNCE_SECONDS", 2.0))
+
+    def run(self):
+        """
+        Starts watching, runs the reconciliation scan and then processes files as they
+        arrive until stop() is called or the process is interrupted.
+        """
+        self.processor.validate_config()
+        self.inotify = Inotify()
+        self._running = True
+        try:
+            # Watch before scanning, so files that land during the scan are not missed
+            self.add_watches(self.target_directory)
+            self.reconcile()
+
+            logging.info(f"Watching '{self.target_directory}' for new documents.")
+            while self._running:
+                # Wake up regularly so that stop() takes effect without new events
+                timeout = min(self.debounce_seconds, 1.0) if self.pending else 1.0
+                for event in self.inotify.read_events(timeout):
+                    self.handle_event(event)
+                self.process_ready_files()
+        except KeyboardInterrupt:
+            logging.info("Watch mode stopped.")
+        finally:
+            self.inotify.close()
+            self.watches.clear()
+
+    def stop(self):
+        self._running = False
+
+    def reconcile(self):
+        """
+        Processes the files that are already in the target directory (or changed while
+        nothing was watching). Files that were ingested before are skipped by the
+        manifest (INCREMENTAL_SCAN) or by their content hash.
+        """
+        logging.info(f"Running reconciliation scan of '{self.target_directory}'.")
+        for file_path in self.processor.iter_target_files():
+            self.pending.pop(str(file_path), None)
+            self.process_file(str(file_path))
+
+    def add_watches(self, directory: str):
+        """
+        Watches a directory and all its subdirectories, except excluded ones. Directories
+        that are watched already are only searched for new subdirectories.
+        Returns the matching files found in them, which may have landed before the
+        watch was in place.
+        """
+        found = []
+        watched = set(self.watches.values())
+        stack = [directory]
+        while stack:
+            current = stack.pop()
+            if self.dir_organised and os.path.abspath(current) == self.dir_organised:
+                continue
+            try:
+                if current not in watched:
+                    self.watches[self.inotify.add_watch(current, WATCH_MASK)] = current
+                entries = list(os.scandir(current))
+            except OSError as e:
+                logging.error(f"Cannot watch directory '{current}': {e}")
+                continue
+
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if not self.processor.is_excluded_dir(entry.name):
+                        stack.append(entry.path)
+                elif self.processor.is_target_file(entry.path):
+                    found.append(entry.path)
+        return found
+
+    def remove_watches(self, directory: str):
+        """
+        Stops watching a directory that was moved away, with all its subdirectories.
+        """
+        prefix = directory + os.sep
+        for wd, path in list(self.watches.items()):
+            if path == directory or path.startswith(prefix):
+                self.inotify.rm_watch(wd)
+                del self.watches[wd]
+
+    def handle_event(self, event):
+        if event.mask & IN_Q_OVERFLOW:
+            logging.warning("Inotify event queue overflowed, running a reconciliation scan.")
+            # Directories created during the overflow lost their events and have no watch yet
+            self.add_watches(self.target_directory)
+            self.reconcile()
+            return
+
+        directory = self.watches.get(event.wd)
+        if directory is None:
+            return
+        if event.mask & IN_IGNORED:
+            # The kernel removed the watch (directory deleted or unmounted)
+            del self.watches[event.wd]
+            return
+        if not event.name:
+            return
+
+        path = os.path.join(directory, event.name)
+        if event.mask & IN_ISDIR:
+            if self.processor.is_excluded_dir(event.name):
+                return
+            if event.mask & (IN_CREATE | IN_MOVED_TO):
+                for file_path in self.add_watches(path):
+                    self.mark_pending(file_path)
+            elif event.mask & IN_MOVED_FROM:
+                self.remove_watches(path)
+            return
+
+        if event.mask & IN_MOVED_FROM:
+            self.pending.pop(path, None)
+        elif self.processor.is_target_file(path):
+            # Any write or arrival restarts the debounce period
+            self.mark_pending(path)
+
+    def mark_pending(self, file_path: str):
+        try:
+            size = os.stat(file_path).st_size
+        except OSError:
+            self.pending.pop(file_path, None)
+            return
+        self.pending[file_path] = (time.monotonic(), size)
+
+    def process_ready_files(self):
+        """
+        Processes the pending files that have been quiet for the debounce period.
+        """
+        now = time.monotonic()
+        for file_path, (last_event, size) in list(self.pending.items()):
+            if now - last_event < self.debounce_seconds:
+                continue
+
+            try:
+                current_size = os.stat(file_path).st_size
+            except OSError:
+                # Removed or moved away before it settled
+                del self.pending[file_path]
+                continue
+            if current_size != size:
+                # Still growing without inotify events (e.g. written through mmap or over NFS)
+                self.pending[file_path] = (now, current_size)
+                continue
+
+            del self.pending[file_path]
+            logging.info(f"Processing new file '{file_path}'.")
+            self.process_file(file_path)
+
+    def process_file(self, file_path: str):
+        """
+        Processes one file. If that raises, the error is logged and the file is put back
+        into `pending` to be retried after debounce_seconds * 2^attempt, at most `max_retries` times.
+        """
+        try:
+            self.processor.process_file(Path(file_path))
+        except Exception as e:
+            attempts = self.retries.get(file_path, 0) + 1
+            if attempts > self.max_retries:
+                logging.error(f"Failed to process '{file_path}' {attempts} times, giving up: {e}")
+                self.retries.pop(file_path, None)
+                return
+
+            self.retries[file_path] = attempts
+            delay = self.debounce_seconds * 2 ** attempts
+            logging.error(f"Failed to process '{file_path}', retrying in {delay:.0f}s: {e}")
+            try:
+                size = os.stat(file_path).st_size
+            except OSError:
+                self.retries.pop(file_path, None)
+                return
+            # Pending files are processed debounce_seconds after their last event
+            self.pending[file_path] = (time.monotonic() + delay - self.debounce_seconds, size)
+            return
+
+        self.retries.pop(file_path, None)
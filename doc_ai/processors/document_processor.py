@@ -1,18 +1,30 @@
 import json
 import logging
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from typing import Dict
 from pathlib import Path
 from langchain_community.document_loaders import PyPDFLoader
 from langchain.output_parsers import PydanticOutputParser
 from langchain.prompts import PromptTemplate
-from doc_ai.configs.models import DocumentRaw, DocumentLlm, DocumentStructured, DocumentStructuredTranslated
+from doc_ai.configs.models import DocumentRaw, DocumentLlm, DocumentStructured, DocumentStructuredTranslated, DocumentChunkSummary, DocumentChunkTranslated
 from doc_ai.configs.prompts import PROCESS_DOC_TEXT_PROMPT, COMMON_INSTRUCTIONS, PROCESS_TRANSLATE_DOC_TEXT_PROMPT
+from doc_ai.configs import prompts, prompts_template
 from doc_ai.processors.ocr import OCRProcessor
 from langdetect import detect_langs
 from doc_ai.utils.general import ALL_LANGUAGES
-from doc_ai.utils.pdf_to_img import pdf_to_page_imgs
-from doc_ai.utils.img import resize_image_to_size
+from doc_ai.utils.pdf_to_img import iter_pdf_page_imgs
+from doc_ai.utils.img import compress_image_to_size
+from doc_ai.utils.text_splitter import split_text
+from doc_ai.utils.dir_tree_context import DirectoryTreeContext
+from doc_ai.utils.dir_tree_index import DirectoryTreeIndex
+
+# Prompts added after an install copied prompts_template.py into prompts.py: use the
+# user's version if there is one, else the template's
+PROCESS_CHUNK_PROMPT = getattr(prompts, "PROCESS_CHUNK_PROMPT", prompts_template.PROCESS_CHUNK_PROMPT)
+PROCESS_TRANSLATE_CHUNK_PROMPT = getattr(prompts, "PROCESS_TRANSLATE_CHUNK_PROMPT", prompts_template.PROCESS_TRANSLATE_CHUNK_PROMPT)
+PROCESS_REDUCE_DOC_PROMPT = getattr(prompts, "PROCESS_REDUCE_DOC_PROMPT", prompts_template.PROCESS_REDUCE_DOC_PROMPT)
 
 # ------------------------------------------------------------------------
 # Document Processing
@@ -23,15 +35,17 @@ class DocumentProcessor:
     (Image, PDF, Text) and returning structured data via Pydantic models.
     """
 
-    def __init__(self, config: dict, llm, dir_tree: str):
+    def __init__(self, config: dict, llm, tree_index: DirectoryTreeIndex):
         """
         :param config: Configuration dictionary.
         :param llm: LLM interface for processing text-based documents.
-        :param dir_tree: Directory tree string for insertion into prompts.
+        :param tree_index: Index of the organised directory tree for insertion into prompts.
         """
         self.config = config
         self.llm = llm
-        self.dir_tree = dir_tree
+        self.tree_index = tree_index
+        token_budget = self.config.get("DIR_TREE_TOKEN_BUDGET")
+        self.tree_context = DirectoryTreeContext(token_budget) if token_budget else None
         self.parser = PydanticOutputParser(pydantic_object=DocumentLlm)
         self.categories = ", ".join(self.config['CATEGORIES'])
 
@@ -41,15 +55,17 @@ class DocumentProcessor:
     def process_img(self, file_path: Path):
         result = None
 
-        file_size_mb = os.path.getsize(file_path)
+        file_size = os.path.getsize(file_path)
         img_limit_mb_in_bytes = self.config['IMG_MB_LIMIT'] * 1024 * 1024  # limit in bytes
 
-        if file_size_mb > img_limit_mb_in_bytes:
-            logging.info(f"Image is too large, resizing to {self.config['IMG_MB_LIMIT']} MB limit.")
-            resize_image_to_size(file_path, file_path, img_limit_mb_in_bytes)
-
         try:
-            result = self.llm.invoke_img_from_path(file_path)
+            if file_size > img_limit_mb_in_bytes:
+                # Compress in memory, the original file is left as it is
+                logging.info(f"Image is too large, compressing to {self.config['IMG_MB_LIMIT']} MB limit.")
+                image_bytes = compress_image_to_size(file_path, img_limit_mb_in_bytes)
+                result = self.llm.invoke_img_from_binary(image_bytes, 'image/jpeg')
+            else:
+                result = self.llm.invoke_img_from_path(file_path)
             logging.info(f"Obtained text from image: {result.text[:100]}{'...' if len(result.text) > 100 else ''}")
             return result
         except Exception as e:
@@ -58,9 +74,10 @@ class DocumentProcessor:
         logging.info("Falling back to OCR...")
 
         try:
+            text, langs = self.processor.load_img_file_and_perform_multi_language_ocr(file_path)
             result = DocumentRaw(
-                text=self.processor.load_img_file_and_perform_ocr(file_path),
-                langs=self.config['document_languages']
+                text=text,
+                langs=langs
             )
         except Exception as e:
             logging.error(f"Error processing image with OCR: {e}")
@@ -99,21 +116,77 @@ class DocumentProcessor:
         # This will happen is the document is a PDF image
 
         logging.info("Document is not recognised by PDF reader, trying to use image processing...")
-        list_image_bytes = pdf_to_page_imgs(file_path)
+        page_images = iter_pdf_page_imgs(
+            file_path,
+            dpi=self.config.get("PDF_DPI", 200),
+            thread_count=self.config.get("PDF_RENDER_THREADS", 1),
+            threshold_method=self.config.get("PDF_THRESHOLD_METHOD", "global"),
+            target_dpi=self.config.get("PDF_TARGET_DPI"),
+        )
+        document = self.process_page_imgs(page_images)
+
+        if len(document.text) > 10:
+            return document
+
+    def process_page_imgs(self, pages) -> DocumentRaw:
+        """
+        Extracts the text of page images with the LLM vision model. Pages are sent
+        concurrently (PDF_PAGE_WORKERS at a time) and each page is retried on its own
+        (PDF_PAGE_RETRIES times), so a failed page does not discard the others.
+
+        :param pages: Iterable of PNG page images as bytes, in page order. Pages are pulled from it
+            only as workers free up, so a streaming iterable keeps memory bounded.
+        :return: DocumentRaw with the page texts joined in page order and the languages merged in order.
+        """
+        workers = self.config.get("PDF_PAGE_WORKERS", 4)
+        results_by_page = {}
+        pending = {}
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for page_num, page_image_bytes in enumerate(pages, 1):
+                if len(pending) >= workers:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        results_by_page[pending.pop(future)] = future.result()
+                pending[executor.submit(self._invoke_page_img, page_num, page_image_bytes)] = page_num
+
+            for future, page_num in pending.items():
+                results_by_page[page_num] = future.result()
+
+        results = [results_by_page[page_num] for page_num in sorted(results_by_page)]
+
         document = DocumentRaw(
             text="",
             langs=[]
         )
         seen = set(document.langs)
+        failed_pages = []
 
-        for page_num, page_image_bytes in enumerate(list_image_bytes, 1):
-            logging.info(f"Processing page {page_num}...")
-            result = self.llm.invoke_img_from_binary(page_image_bytes, 'image/png')
+        for page_num, result in enumerate(results, 1):
+            if result is None:
+                failed_pages.append(page_num)
+                continue
             document.text += "\n\n" + result.text
             document.langs.extend(item for item in result.langs if item not in seen and not seen.add(item))
 
-        if len(document.text) > 10:
-            return document
+        if failed_pages:
+            logging.error(f"Could not extract text from pages {failed_pages} of {len(results)}.")
+
+        return document
+
+    def _invoke_page_img(self, page_num: int, page_image_bytes: bytes) -> DocumentRaw | None:
+        retries = self.config.get("PDF_PAGE_RETRIES", 2)
+
+        for attempt in range(retries + 1):
+            try:
+                logging.info(f"Processing page {page_num}...")
+                return self.llm.invoke_img_from_binary(page_image_bytes, 'image/png')
+            except Exception as e:
+                logging.warning(f"Error processing page {page_num} (attempt {attempt + 1} of {retries + 1}): {e}")
+                if attempt < retries:
+                    time.sleep(2 ** attempt)
+
+        return None
 
     @staticmethod
     def detect_languages_in_text(document_text: str) -> list:
@@ -130,13 +203,35 @@ class DocumentProcessor:
             return []
 
 
+    def get_dir_tree(self, document_text: str) -> str:
+        """
+        Returns the directory tree for the prompt: pruned to the parts relevant to the
+        document if DIR_TREE_TOKEN_BUDGET is set, otherwise the full tree.
+        """
+        dir_tree = self.tree_index.render()
+        if self.tree_context is None:
+            return dir_tree
+        return self.tree_context.build(self.tree_index.paths(), document_text, dir_tree)
+
+    @staticmethod
+    def needs_translation(document_original: DocumentRaw, user_language: str) -> bool:
+        return not (len(document_original.langs) == 1 and document_original.langs[0] == user_language)
+
+    def exceeds_context_length(self, document_original: DocumentRaw) -> bool:
+        tokens = len(document_original.text)/4
+        return tokens > self.config.get("LLM_CONTEXT_LENGTH", 16000)
+
     def process_document_text(self, document_original: Dict, user_language :str) -> DocumentStructured:
         """
         Translates the given document_text to English and returns a Pydantic model with translation.
+        Documents that exceed LLM_CONTEXT_LENGTH are processed with process_document_text_chunked.
 
         :return: DocumentStructured object containing the translated text and summary.
         """
-        if document_original.langs == user_language:
+        if self.exceeds_context_length(document_original):
+            return self.process_document_text_chunked(document_original, user_language)
+
+        if not self.needs_translation(document_original, user_language):
             prompt_template = PROCESS_DOC_TEXT_PROMPT
             parser = PydanticOutputParser(pydantic_object=DocumentStructured)
         else:
@@ -150,7 +245,7 @@ class DocumentProcessor:
                 "document_languages": document_original.langs,
                 "user_language": user_language,
                 "categories": self.categories,
-                "dir_tree":self.dir_tree,
+                "dir_tree": self.get_dir_tree(document_original.text),
                 "common_instructions": COMMON_INSTRUCTIONS,
                 "format_instructions": parser.get_format_instructions()
             },
@@ -163,6 +258,115 @@ class DocumentProcessor:
             logging.error(f"Error during translation: {e}")
             return None
 
+    def process_document_text_chunked(self, document_original: DocumentRaw, user_language: str) -> DocumentStructured:
+        """
+        Map-reduce variant of process_document_text for documents that do not fit into a single prompt.
+
+        1. The text is split on page and paragraph boundaries into chunks of LLM_CHUNK_TOKENS.
+        2. The chunks are summarized (and translated if needed) concurrently, LLM_CHUNK_WORKERS at a time.
+        3. One reduce call creates the DocumentStructured fields from the chunk summaries.
+           If the summaries are still too long for one prompt, they are summarized again in
+           groups first (see combine_summaries). The translation is the chunk translations joined in order.
+
+        :return: DocumentStructured (or DocumentStructuredTranslated) object, or None if any chunk failed.
+        """
+        translate = self.needs_translation(document_original, user_language)
+        chunk_chars = self.config.get("LLM_CHUNK_TOKENS", 6000) * 4
+        chunks = split_text(document_original.text, chunk_chars)
+        logging.info(f"Document is too long for a single prompt, processing it in {len(chunks)} chunks.")
+
+        if translate:
+            chunk_template, chunk_model = PROCESS_TRANSLATE_CHUNK_PROMPT, DocumentChunkTranslated
+        else:
+            chunk_template, chunk_model = PROCESS_CHUNK_PROMPT, DocumentChunkSummary
+
+        try:
+            chunk_results = self.summarize_chunks(chunks, chunk_template, chunk_model, document_original.langs, user_language)
+        except Exception as e:
+            logging.error(f"Error while processing document chunks: {e}")
+            return None
+
+        parser = PydanticOutputParser(pydantic_object=DocumentStructured)
+        prompt = PromptTemplate(
+            template=PROCESS_REDUCE_DOC_PROMPT,
+            input_variables=["document_text"],
+            partial_variables={
+                "document_languages": document_original.langs,
+                "user_language": user_language,
+                "categories": self.categories,
+                "dir_tree": self.get_dir_tree(chunks[0]),
+                "common_instructions": COMMON_INSTRUCTIONS,
+                # The title and dates are usually on the first page
+                "document_beginning": chunks[0][:2000],
+                "format_instructions": parser.get_format_instructions()
+            },
+        )
+        summaries = [f"Part {chunk_number}:\n{result.summary}" for chunk_number, result in enumerate(chunk_results, 1)]
+
+        try:
+            summaries_text = self.combine_summaries(summaries, document_original.langs, user_language)
+            response = self.llm.invoke_llm(prompt, summaries_text, parser)
+        except Exception as e:
+            logging.error(f"Error while combining document chunks: {e}")
+            return None
+
+        if not translate:
+            return response
+
+        return DocumentStructuredTranslated(
+            **response.model_dump(),
+            text_user_lang="\n\n".join(result.text_user_lang for result in chunk_results)
+        )
+
+    def summarize_chunks(self, chunks: list, template: str, model, document_languages: list, user_language: str) -> list:
+        """
+        Runs the chunk prompt over every chunk, LLM_CHUNK_WORKERS at a time.
+
+        :return: list - The parsed responses (`model` objects), in chunk order.
+        """
+        chunk_parser = PydanticOutputParser(pydantic_object=model)
+
+        def process_chunk(chunk_number, chunk_text):
+            prompt = PromptTemplate(
+                template=template,
+                input_variables=["document_text"],
+                partial_variables={
+                    "chunk_number": chunk_number,
+                    "chunk_count": len(chunks),
+                    "document_languages": document_languages,
+                    "user_language": user_language,
+                    "format_instructions": chunk_parser.get_format_instructions()
+                },
+            )
+            logging.info(f"Processing chunk {chunk_number} of {len(chunks)}...")
+            return self.llm.invoke_llm(prompt, chunk_text, chunk_parser)
+
+        with ThreadPoolExecutor(max_workers=self.config.get("LLM_CHUNK_WORKERS", 4)) as executor:
+            return list(executor.map(process_chunk, range(1, len(chunks) + 1), chunks))
+
+    def combine_summaries(self, summaries: list, document_languages: list, user_language: str) -> str:
+        """
+        Joins the chunk summaries for the reduce prompt. As long as they exceed the context
+        length, neighbouring summaries are grouped into chunks of LLM_CHUNK_TOKENS and every
+        group is summarized again, so very long documents are reduced hierarchically.
+
+        :return: str - Summaries that fit into one prompt, in document order.
+        """
+        chunk_chars = self.config.get("LLM_CHUNK_TOKENS", 6000) * 4
+        text = "\n\n".join(summaries)
+        level = 1
+        while self.exceeds_context_length(DocumentRaw(text=text, langs=document_languages)):
+            groups = split_text(text, chunk_chars)
+            logging.info(f"Chunk summaries are too long for one prompt, summarizing them in {len(groups)} groups (level {level}).")
+            results = self.summarize_chunks(groups, PROCESS_CHUNK_PROMPT, DocumentChunkSummary, document_languages, user_language)
+            combined = "\n\n".join(f"Section {number}:\n{result.summary}" for number, result in enumerate(results, 1))
+            if len(combined) >= len(text):
+                logging.warning("Summarizing the chunk summaries did not shorten them, using them as they are.")
+                break
+            text = combined
+            level += 1
+        return text
+
     @staticmethod
     def attempt_to_load_json(content):
         # Remove the surrounding markdown and newline characters
@@ -0,0 +1,110 @@
+import logging
+import os
+from pathlib import Path
+from doc_ai.clients.sqlite_client import DocumentDatabase
+
+# ------------------------------------------------------------------------
+# Incremental Scanning
+# ------------------------------------------------------------------------
+class ManifestScanner:
+    """
+    Scans the target directory and yields only files that are new or changed since
+    they were last handled. Every handled file is recorded in the scan manifest
+    (SQLite) with its size, mtime and inode, so a rescan of an unchanged tree costs
+    one stat per matching file and no reads.
+    """
+
+    def __init__(self, db: DocumentDatabase, target_directory: str, extensions: list, excluded_dirs: list):
+        """
+        :param db: DocumentDatabase holding the scan manifest.
+        :param target_directory: Directory to scan.
+        :param extensions: Normalized file extensions to include, e.g. ['.pdf', '.png'].
+        :param excluded_dirs: Lowercase directory names to skip.
+        """
+        self.db = db
+        self.target_directory = target_directory
+        self.extensions = set(extensions)
+        self.excluded_dirs = set(excluded_dirs)
+        # Stat of the files being processed, until they are recorded
+        self._scanned = {}
+
+    @staticmethod
+    def manifest_key(file_path) -> str:
+        """
+        Key of a file in the manifest: its absolute, normalized path, so that './docs/a.pdf',
+        'docs/a.pdf' and Path objects of either refer to the same entry.
+        """
+        return os.path.abspath(file_path)
+
+    def iter_changed_files(self):
+        """
+        Yields the paths of matching files whose (size, mtime, inode) differ from the manifest.
+        Files that failed are never recorded, so they are yielded again on the next scan.
+        """
+        # Normalized here too, for entries recorded under another spelling of the path
+        manifest = {self.manifest_key(path): signature for path, signature in self.db.load_manifest().items()}
+        unchanged = 0
+        stack = [self.target_directory]
+
+        while stack:
+            directory = stack.pop()
+            try:
+                entries = list(os.scandir(directory))
+            except OSError as e:
+                logging.error(f"Cannot scan directory '{directory}': {e}")
+                continue
+
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    # Exclude directories starting with a dot or in the excluded list
+                    if not entry.name.startswith('.') and entry.name.lower() not in self.excluded_dirs:
+                        stack.append(entry.path)
+                    continue
+
+                extension = os.path.splitext(entry.name)[1].lower()
+                if extension not in self.extensions or not entry.is_file(follow_symlinks=False):
+                    continue
+
+                try:
+                    stat = entry.stat(follow_symlinks=False)
+                except OSError as e:
+                    logging.error(f"Cannot stat file '{entry.path}': {e}")
+                    continue
+
+                signature = (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+                key = self.manifest_key(entry.path)
+                if manifest.get(key) == signature:
+                    unchanged += 1
+                    continue
+
+                self._scanned[key] = signature
+                yield Path(entry.path)
+
+        logging.info(f"Incremental scan skipped {unchanged} unchanged files.")
+
+    def remember(self, file_path):
+        """
+        Takes the stat of a file right before its content is hashed, so that record() can store
+        it after the file was moved away. Also covers files that were not yielded by
+        iter_changed_files, e.g. ones picked up by the watcher.
+        """
+        key = self.manifest_key(file_path)
+        try:
+            stat = os.stat(key, follow_symlinks=False)
+        except OSError:
+            self._scanned.pop(key, None)
+            return
+        self._scanned[key] = (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+
+    def record(self, file_path, status: str):
+        """
+        Records a file yielded by iter_changed_files (or passed to remember) in the manifest.
+
+        :param file_path: Path of the file.
+        :param status: Outcome, 'processed' or 'duplicate'.
+        """
+        key = self.manifest_key(file_path)
+        signature = self._scanned.pop(key, None)
+        if signature is None:
+            return
+        self.db.update_manifest(key, *signature, status)
@@ -1,8 +1,15 @@
 import cv2
 import pytesseract
 import os
+import logging
+import math
+import multiprocessing
+import time
 import requests
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from doc_ai.utils.page_preprocessing import otsu_threshold
 
 # Language mapper from ISO standard to OCR
 # refer to language files here: https://github.com/tesseract-ocr/tessdata
@@ -14,6 +21,78 @@ lang_map = {
     'ro': 'ron',
 }
 
+# Preprocessing profiles, from cheapest to most expensive
+PREPROCESSING_PROFILES = ("fast", "balanced", "thorough")
+
+# Noise estimates (standard deviation in gray levels) below which a lighter profile is enough
+NOISE_FAST_MAX = 2.0
+NOISE_BALANCED_MAX = 5.0
+# Above this many megapixels glyphs are large enough to tolerate more noise (e.g. 300 DPI A4 is ~8.7 MP)
+HIGH_RESOLUTION_MP = 6.0
+
+
+def estimate_noise(gray) -> float:
+    """
+    Estimates the standard deviation of the image noise with Immerkær's method: a
+    single 3x3 convolution that cancels out edges and smooth gradients.
+
+    Args:
+        gray (numpy.ndarray): Grayscale image.
+
+    Returns:
+        float: Estimated noise standard deviation in gray levels.
+    """
+    height, width = gray.shape
+    if height < 3 or width < 3:
+        return 0.0
+    kernel = np.array([[1, -2, 1], [-2, 4, -2], [1, -2, 1]], dtype=np.float32)
+    response = cv2.filter2D(gray.astype(np.float32), -1, kernel)[1:-1, 1:-1]
+    return float(np.abs(response).sum() * math.sqrt(math.pi / 2) / (6 * (width - 2) * (height - 2)))
+
+
+def ocr_with_confidence(image, language: str) -> tuple:
+    """
+    Runs tesseract once and returns the recognised text together with its mean word
+    confidence. The text is rebuilt from the word boxes of image_to_data, so the
+    confidence does not cost a second OCR pass.
+
+    Defined at module level so that it can run in a process pool.
+
+    Args:
+        image (numpy.ndarray): The preprocessed image.
+        language (str): Tesseract language code, e.g. 'deu' or 'deu+eng'.
+
+    Returns:
+        tuple: (language, text, confidence) where confidence is between 0 and 100.
+    """
+    data = pytesseract.image_to_data(image, lang=language, output_type=pytesseract.Output.DICT)
+
+    lines = {}
+    weighted_confidence = 0.0
+    characters = 0
+    for word, confidence, block, paragraph, line in zip(
+            data["text"], data["conf"], data["block_num"], data["par_num"], data["line_num"]):
+        word = word.strip()
+        confidence = float(confidence)
+        # Boxes without text (blocks, lines) have a confidence of -1
+        if not word or confidence < 0:
+            continue
+        lines.setdefault((block, paragraph, line), []).append(word)
+        # Weight by word length, so that a few confident short tokens do not win over real text
+        weighted_confidence += confidence * len(word)
+        characters += len(word)
+
+    text_lines = []
+    previous_paragraph = None
+    for (block, paragraph, _), words in lines.items():
+        if previous_paragraph is not None and (block, paragraph) != previous_paragraph:
+            text_lines.append("")
+        text_lines.append(" ".join(words))
+        previous_paragraph = (block, paragraph)
+
+    return language, "\n".join(text_lines), weighted_confidence / characters if characters else 0.0
+
+
 class OCRProcessor:
     def __init__(self, config: str):
         """
@@ -26,6 +105,7 @@ class OCRProcessor:
         self.config = config
         os.environ['TESSDATA_PREFIX'] = self.config['TESSDATA_DIR']
         self.download_lang_files()
+        self._pool = None
 
     def download_lang_files(self):
         for lang in self.config['DOCUMENT_LANGUAGES']:
@@ -36,59 +116,160 @@ class OCRProcessor:
             # Download the language file if needed
             self.download_language_file(url, download_path)
 
-    def preprocess(self, image):
+    @staticmethod
+    def to_gray(image):
+        return image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+    def select_profile(self, image) -> str:
+        """
+        Picks a preprocessing profile from cheap image statistics: the noise estimate
+        and the resolution. Clean digital scans skip denoising altogether.
+
+        Args:
+            image (numpy.ndarray): The input image.
+
+        Returns:
+            str: One of PREPROCESSING_PROFILES.
+        """
+        gray = self.to_gray(image)
+        noise = estimate_noise(gray)
+        megapixels = gray.size / 1_000_000
+        tolerance = 1.5 if megapixels >= HIGH_RESOLUTION_MP else 1.0
+
+        if noise <= NOISE_FAST_MAX * tolerance:
+            profile = "fast"
+        elif noise <= NOISE_BALANCED_MAX * tolerance:
+            profile = "balanced"
+        else:
+            profile = "thorough"
+
+        logging.info(f"Image noise estimate {noise:.2f} at {megapixels:.1f} MP, using '{profile}' preprocessing.")
+        return profile
+
+    def preprocess(self, image, profile="auto"):
         """
         Preprocess the image for better OCR results.
 
         Args:
             image (numpy.ndarray): The input image.
+            profile (str): One of PREPROCESSING_PROFILES, or 'auto' to select one with select_profile.
+                'fast' only binarizes, 'balanced' adds a light denoising and sharpening, and
+                'thorough' runs the full non-local means denoising.
 
         Returns:
             numpy.ndarray: The preprocessed image.
         """
+        if profile == "auto":
+            profile = self.select_profile(image)
+        if profile not in PREPROCESSING_PROFILES:
+            raise ValueError(f"Unknown preprocessing profile '{profile}'. Use one of {PREPROCESSING_PROFILES}.")
 
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        denoised = cv2.fastNlMeansDenoising(gray, None, h=10, templateWindowSize=7, searchWindowSize=21)
-        kernel_sharpening = np.array([[-1, -1, -1], [-1, 9, -1], [-1, -1, -1]])
-        sharpened = cv2.filter2D(denoised, -1, kernel_sharpening)
-        _, thresholded = cv2.threshold(sharpened, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+        gray = self.to_gray(image)
+        if profile == "fast":
+            sharpened = gray
+        else:
+            if profile == "balanced":
+                # The cost of non-local means grows with the square of the search window
+                denoised = cv2.fastNlMeansDenoising(gray, None, h=10, templateWindowSize=5, searchWindowSize=7)
+            else:
+                denoised = cv2.fastNlMeansDenoising(gray, None, h=10, templateWindowSize=7, searchWindowSize=21)
+            kernel_sharpening = np.array([[-1, -1, -1], [-1, 9, -1], [-1, -1, -1]])
+            sharpened = cv2.filter2D(denoised, -1, kernel_sharpening)
+        thresholded = otsu_threshold(sharpened, invert=True)
         kernel_erosion = np.ones((2, 2), np.uint8)
         eroded_image = cv2.erode(thresholded, kernel_erosion, iterations=1)
         return eroded_image
 
-
-
-    def load_img_file_and_perform_ocr(self, image_path, language = "deu"):
+    def load_img_file_and_perform_multi_language_ocr(self, image_path, languages=None, combined=None):
         """
-        Perform OCR on the given image.
+        Perform OCR on the given image in several languages and keep the best result.
 
         Args:
             image_path (str): Path to the input image.
-            language (str): Language to use for OCR.
+            languages (list of str): ISO 639-1 codes to try. Default is DOCUMENT_LANGUAGES.
+            combined (bool): Run a single pass with all languages (e.g. 'deu+eng+rus') instead of
+                one pass per language. Default is OCR_LANGUAGE_MODE == 'combined'.
 
         Returns:
-            str: Extracted text from the image.
+            tuple: (text, languages) - the extracted text and the ISO 639-1 codes of the winning pass.
         """
-        # Read the image
-        image = cv2.imread(image_path)
+        image = cv2.imread(str(image_path))
         if image is None:
             raise FileNotFoundError(f"Image not found at {image_path}")
 
-        # Preprocess the image
-        preprocessed_image = self.preprocess(image)
+        return self.perform_multi_language_ocr(image, languages, combined)
+
+    def perform_multi_language_ocr(self, image, languages=None, combined=None):
+        """
+        Preprocesses the image once and runs tesseract for each language in a process pool,
+        scoring the passes by their word confidences. See load_img_file_and_perform_multi_language_ocr.
+
+        With OCR_PREPROCESSING_PROFILE 'auto' (the default) the cheapest suitable profile is
+        tried first, and the next heavier one only if the best confidence stays below
+        OCR_MIN_CONFIDENCE.
+        """
+        languages = [lang for lang in (languages or self.config['DOCUMENT_LANGUAGES']) if lang in lang_map]
+        if not languages:
+            raise ValueError("None of the document languages is supported by OCR.")
+        if combined is None:
+            combined = self.config.get("OCR_LANGUAGE_MODE", "parallel") == "combined"
+
+        profile = self.config.get("OCR_PREPROCESSING_PROFILE", "auto")
+        escalate = profile == "auto"
+        if escalate:
+            profile = self.select_profile(image)
+        min_confidence = self.config.get("OCR_MIN_CONFIDENCE", 60)
+
+        best = None
+        while True:
+            start = time.perf_counter()
+            preprocessed_image = self.preprocess(image, profile)
+            preprocessed = time.perf_counter()
+            text, langs, confidence = self._ocr_languages(preprocessed_image, languages, combined)
+            logging.info(
+                f"OCR profile '{profile}': preprocessing {preprocessed - start:.2f}s, "
+                f"OCR {time.perf_counter() - preprocessed:.2f}s, confidence {confidence:.1f}"
+            )
+
+            if best is None or confidence > best[2]:
+                best = (text, langs, confidence)
+
+            next_profile = PREPROCESSING_PROFILES.index(profile) + 1
+            if not escalate or confidence >= min_confidence or next_profile == len(PREPROCESSING_PROFILES):
+                break
+            profile = PREPROCESSING_PROFILES[next_profile]
+            logging.info(f"OCR confidence below {min_confidence}, retrying with '{profile}' preprocessing.")
+
+        return best[0], best[1]
+
+    def _ocr_languages(self, preprocessed_image, languages, combined):
+        """Returns (text, languages, confidence) of the best OCR pass over the given languages."""
+        if combined or len(languages) == 1:
+            _, text, confidence = ocr_with_confidence(preprocessed_image, "+".join(lang_map[lang] for lang in languages))
+            logging.info(f"OCR with {'+'.join(languages)}: confidence {confidence:.1f}")
+            return text.strip(), languages, confidence
 
-        # Perform OCR
-        text = pytesseract.image_to_string(preprocessed_image, lang=language) # TODO, this should be trying all languages
-        return text.strip()
+        codes = [lang_map[lang] for lang in languages]
+        results = list(self._get_pool().map(ocr_with_confidence, repeat(preprocessed_image), codes))
+        for code, _, confidence in results:
+            logging.info(f"OCR with {code}: confidence {confidence:.1f}")
 
-    def perform_ocr_from_image(self, image, language = "deu"):
-        # Preprocess the image
-        preprocessed_image = self.preprocess(image)
+        best_code, text, confidence = max(results, key=lambda result: result[2])
+        return text.strip(), [languages[codes.index(best_code)]], confidence
 
-        # Perform OCR
-        text = pytesseract.image_to_string(preprocessed_image, lang=language) # TODO, this should be trying all languages
-        return text.strip()
+    def _get_pool(self) -> ProcessPoolExecutor:
+        # Created on first use and kept, so the worker start-up cost is paid once per run.
+        # "spawn" avoids forking a process that may be running pipeline threads.
+        if self._pool is None:
+            workers = self.config.get("OCR_WORKERS") or min(len(self.config['DOCUMENT_LANGUAGES']), os.cpu_count() or 1)
+            self._pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
 
+    def close(self):
+        """Shut down the OCR process pool."""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
 
     def remove_extra_spaces(self, text_list):
         """
@@ -0,0 +1,161 @@
+import logging
+import queue
+import threading
+from typing import Iterable
+
+# ------------------------------------------------------------------------
+# Staged Concurrent Ingestion
+# ------------------------------------------------------------------------
+
+# Marker put on a queue to tell a worker that no more items will follow
+_STOP = object()
+# Result of a stage for an item that is intentionally dropped (e.g. already ingested)
+_SKIPPED = object()
+
+
+class IngestionPipeline:
+    """
+    Runs the processing stages of a DirectoryProcessor concurrently:
+
+        paths -> [extract] -> queue -> [structure] -> queue -> [persist]
+
+    Every stage has its own pool of worker threads. Stages are joined by bounded
+    queues, so a fast stage blocks (backpressure) instead of piling up extracted
+    documents in memory while a slower stage (usually the LLM) catches up.
+    """
+
+    def __init__(self, directory_processor, extract_workers: int = 2, structure_workers: int = 4,
+                 persist_workers: int = 1, queue_size: int = 8):
+        """
+        :param directory_processor: DirectoryProcessor providing the stage methods.
+        :param extract_workers: Number of threads running text extraction (PDF reader, vision LLM, OCR).
+        :param structure_workers: Number of threads running the structuring/translation LLM call.
+        :param persist_workers: Number of threads writing to SQLite and the vector store and moving files.
+        :param queue_size: Maximum number of items waiting between two stages.
+        """
+        if min(extract_workers, structure_workers, persist_workers, queue_size) < 1:
+            raise ValueError("Pipeline worker counts and queue size must be at least 1.")
+
+        self.processor = directory_processor
+        self.extract_workers = extract_workers
+        self.structure_workers = structure_workers
+        self.persist_workers = persist_workers
+        self.queue_size = queue_size
+
+        self.stats = {"discovered": 0, "skipped": 0, "extracted": 0, "structured": 0, "persisted": 0, "failed": 0}
+        self._stats_lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, directory_processor, config: dict):
+        """
+        Creates a pipeline from the PIPELINE_* configuration keys.
+        """
+        return cls(
+            directory_processor,
+            extract_workers=config.get("PIPELINE_EXTRACT_WORKERS", 2),
+            structure_workers=config.get("PIPELINE_STRUCTURE_WORKERS", 4),
+            persist_workers=config.get("PIPELINE_PERSIST_WORKERS", 1),
+            queue_size=config.get("PIPELINE_QUEUE_SIZE", 8),
+        )
+
+    def run(self, file_paths: Iterable) -> dict:
+        """
+        Processes all file paths and blocks until every stage has drained.
+
+        :param file_paths: Iterable of file paths, e.g. DirectoryProcessor.iter_target_files().
+        :return: dict - Counters of discovered, skipped, extracted, structured, persisted and failed files.
+        """
+        paths_queue = queue.Queue(maxsize=self.queue_size)
+        extracted_queue = queue.Queue(maxsize=self.queue_size)
+        structured_queue = queue.Queue(maxsize=self.queue_size)
+
+        stages = [
+            ("extract", self.extract_workers, paths_queue, extracted_queue, self._extract),
+            ("structure", self.structure_workers, extracted_queue, structured_queue, self._structure),
+            ("persist", self.persist_workers, structured_queue, None, self._persist),
+        ]
+
+        stage_threads = []
+        for name, workers, in_queue, out_queue, handler in stages:
+            threads = [
+                threading.Thread(
+                    target=self._worker,
+                    args=(in_queue, out_queue, handler),
+                    name=f"pipeline-{name}-{i}",
+                    daemon=True,
+                )
+                for i in range(workers)
+            ]
+            for thread in threads:
+                thread.start()
+            stage_threads.append((threads, in_queue, out_queue))
+
+        logging.info(
+            f"Pipeline started with {self.extract_workers} extract, {self.structure_workers} structure "
+            f"and {self.persist_workers} persist workers."
+        )
+
+        try:
+            for file_path in file_paths:
+                paths_queue.put(file_path)
+                self._count("discovered")
+        finally:
+            # Shut the stages down in order: once every worker of a stage has exited,
+            # nothing more can reach the next queue, so it is safe to stop that one too.
+            for threads, in_queue, out_queue in stage_threads:
+                for _ in threads:
+                    in_queue.put(_STOP)
+                for thread in threads:
+                    thread.join()
+
+        logging.info(f"Pipeline finished: {self.stats}")
+        return dict(self.stats)
+
+    def _worker(self, in_queue: queue.Queue, out_queue: queue.Queue | None, handler):
+        while True:
+            item = in_queue.get()
+            if item is _STOP:
+                return
+
+            try:
+                result = handler(item)
+            except Exception as e:
+                logging.error(f"Pipeline worker failed on {item if not isinstance(item, tuple) else item[0]}: {e}")
+                result = None
+
+            if result is None:
+                self._count("failed")
+            elif result is _SKIPPED:
+                continue
+            elif out_queue is not None:
+                out_queue.put(result)
+
+    def _extract(self, file_path):
+        content_hash = self.processor.fingerprint_file(file_path)
+        if content_hash is None:
+            self._count("skipped")
+            return _SKIPPED
+
+        document_original = self.processor.extract_document(file_path)
+        if document_original is None:
+            return None
+        self._count("extracted")
+        return file_path, document_original, content_hash
+
+    def _structure(self, item):
+        file_path, document_original, content_hash = item
+        structured = self.processor.structure_document(file_path, document_original, content_hash)
+        if structured is None:
+            return None
+        self._count("structured")
+        return (file_path, *structured)
+
+    def _persist(self, item):
+        if not self.processor.persist_document(*item):
+            return None
+        self._count("persisted")
+        return True
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self.stats[key] += 1
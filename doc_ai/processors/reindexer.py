@@ -0,0 +1,184 @@
+import json
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from doc_ai.clients.sqlite_client import DocumentDatabase
+from doc_ai.configs.models import Document
+
+# ------------------------------------------------------------------------
+# Bulk Reindexing and Export
+# ------------------------------------------------------------------------
+class Reindexer:
+    """
+    Rebuilds the vector store from the SQLite documents table, e.g. after a schema or
+    embedding model change, without any LLM calls.
+
+    Rows are read in keyset pages and every page is embedded and written as one batch,
+    with up to `workers` pages in flight. After each page the checkpoint file records
+    the last id up to which all pages are written, so an interrupted run resumes there.
+    """
+
+    def __init__(self, db: DocumentDatabase, vector_client, table_name: str = 'documents', page_size: int = 500,
+                 workers: int = 4, checkpoint_path: str = None):
+        """
+        :param db: Database holding the documents.
+        :param vector_client: VdbClient or LocalVdbClient to write to.
+        :param table_name: Name of the documents table.
+        :param page_size: Number of documents read and written per batch.
+        :param workers: Number of batches written in parallel.
+        :param checkpoint_path: JSON file recording the progress, or None to always start from the beginning.
+        """
+        if page_size < 1 or workers < 1:
+            raise ValueError("page_size and workers must be at least 1.")
+
+        self.db = db
+        self.vector_client = vector_client
+        self.table_name = table_name
+        self.page_size = page_size
+        self.workers = workers
+        self.checkpoint_path = checkpoint_path
+
+    @classmethod
+    def from_config(cls, db: DocumentDatabase, vector_client, config: dict):
+        """
+        Creates a reindexer from the REINDEX_* configuration keys.
+        """
+        return cls(
+            db,
+            vector_client,
+            config.get("SQLITE_TABLE_NAME", "documents"),
+            page_size=config.get("REINDEX_PAGE_SIZE", 500),
+            workers=config.get("REINDEX_WORKERS", 4),
+            checkpoint_path=config.get("REINDEX_CHECKPOINT_PATH"),
+        )
+
+    def load_checkpoint(self) -> dict:
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, "r") as file:
+                checkpoint = json.load(file)
+            if checkpoint.get("table") == self.table_name:
+                return checkpoint
+        return {"table": self.table_name, "last_id": 0, "written": 0, "failed": 0}
+
+    def save_checkpoint(self, checkpoint: dict):
+        if not self.checkpoint_path:
+            return
+        # Write and rename, so that a crash never leaves a truncated checkpoint
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(checkpoint, file)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def clear_checkpoint(self):
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+    @staticmethod
+    def to_document(row: dict) -> Document:
+        """Builds the Document of a documents table row."""
+        return Document(
+            uuid=row["vdb_uuid"],
+            title=row["title"],
+            text=row["text"],
+            summary=row["summary"],
+            text_orig=row["text_orig"],
+            category=row["category"],
+            tags=row["tags"],
+            timestamp=row["timestamp"],
+            langs=row["langs"],
+            filepath=row["filepath"],
+            filepath_orig=row["filepath_orig"] or "",
+            content_hash=row.get("content_hash"),
+        )
+
+    def run(self, restart: bool = False, recreate_collection: bool = False) -> dict:
+        """
+        Writes all documents to the vector store.
+
+        :param restart: Ignore the checkpoint and start from the first document.
+        :param recreate_collection: Delete and create the collection first (only when not resuming).
+        :return: dict - The final checkpoint: last_id, written and failed counts.
+        """
+        if restart:
+            self.clear_checkpoint()
+        checkpoint = self.load_checkpoint()
+        if checkpoint["last_id"]:
+            logging.info(f"Resuming reindex after document id {checkpoint['last_id']}.")
+        elif recreate_collection:
+            self.vector_client.delete_collection()
+            self.vector_client.create_collection()
+
+        total = self.db.count_documents(checkpoint["last_id"], self.table_name)
+        logging.info(f"Reindexing {total} documents in pages of {self.page_size} with {self.workers} workers.")
+
+        start = time.perf_counter()
+        done = 0
+        in_flight = deque()  # (last id of the page, number of documents, future), in page order
+
+        def complete_oldest():
+            nonlocal done
+            last_id, count, future = in_flight.popleft()
+            failed = len(future.result())
+            done += count
+            checkpoint["last_id"] = last_id
+            checkpoint["written"] += count - failed
+            checkpoint["failed"] += failed
+            self.save_checkpoint(checkpoint)
+
+            elapsed = time.perf_counter() - start
+            rate = done / elapsed if elapsed else 0
+            remaining = (total - done) / rate if rate else 0
+            logging.info(f"Reindexed {done}/{total} documents ({rate:.0f}/s, about {remaining:.0f}s left).")
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for rows in self.db.iter_documents(checkpoint["last_id"], self.page_size, self.table_name):
+                objects = [
+                    (self.vector_client.make_properties(self.to_document(row), row["id"]), row["vdb_uuid"])
+                    for row in rows
+                ]
+                in_flight.append((rows[-1]["id"], len(rows), executor.submit(self.vector_client.write_objects, objects)))
+                # Pages complete in order for the checkpoint; this also bounds the pages held in memory
+                while len(in_flight) >= self.workers:
+                    complete_oldest()
+            while in_flight:
+                complete_oldest()
+
+        logging.info(
+            f"Reindex finished: {checkpoint['written']} written, {checkpoint['failed']} failed "
+            f"in {time.perf_counter() - start:.1f}s."
+        )
+        return checkpoint
+
+
+def export_documents_jsonl(db: DocumentDatabase, path: str, table_name: str = 'documents', page_size: int = 500) -> int:
+    """
+    Streams the documents table to a JSONL file, one document per line.
+
+    :return: int - Number of exported documents.
+    """
+    count = 0
+    with open(path, "w", encoding="utf-8") as file:
+        for rows in db.iter_documents(0, page_size, table_name):
+            for row in rows:
+                file.write(json.dumps(row, ensure_ascii=False, default=str) + "\n")
+            count += len(rows)
+    logging.info(f"Exported {count} documents to '{path}'.")
+    return count
+
+
+def export_vector_store_jsonl(vector_client, path: str, include_vector: bool = False) -> int:
+    """
+    Streams the objects of the vector store to a JSONL file, one object per line
+    (uuid, properties and, if requested, the vector).
+
+    :return: int - Number of exported objects.
+    """
+    count = 0
+    with open(path, "w", encoding="utf-8") as file:
+        for item in vector_client.iter_objects(include_vector):
+            file.write(json.dumps(item, ensure_ascii=False, default=str) + "\n")
+            count += 1
+    logging.info(f"Exported {count} vector store objects to '{path}'.")
+    return count
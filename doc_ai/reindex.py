@@ -0,0 +1,55 @@
+import argparse
+import os
+from utils.general import load_config
+from utils.logger_setup import setup_logger
+from processors.reindexer import Reindexer, export_documents_jsonl, export_vector_store_jsonl
+from doc_ai.clients.sqlite_client import DocumentDatabase, pragmas_from_config
+from doc_ai.clients.vdb_client import VdbClient
+from doc_ai.clients.local_vdb_client import LocalVdbClient
+
+# ------------------------------------------------------------------------
+# Configure Logging
+# ------------------------------------------------------------------------
+
+import logging
+# Configure the logger
+setup_logger(log_file="errors.log", console_level=logging.INFO, file_level=logging.ERROR)
+
+# ------------------------------------------------------------------------
+# Main Execution
+# ------------------------------------------------------------------------
+def main():
+    """
+    Rebuilds the vector store from the SQLite database, or exports both stores as JSONL.
+    """
+    parser = argparse.ArgumentParser(description="Reindex the SQLite documents into the vector store.")
+    parser.add_argument("--recreate", action="store_true", help="Delete and create the collection before a fresh run.")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and start from the first document.")
+    parser.add_argument("--export-dir", help="Export documents.jsonl and vectors.jsonl to this directory instead of reindexing.")
+    parser.add_argument("--include-vectors", action="store_true", help="Include the vectors in vectors.jsonl.")
+    args = parser.parse_args()
+
+    config_file = "configs/config.json"  # Path to the configuration file
+    config = load_config(config_file)
+    table_name = config.get("SQLITE_TABLE_NAME", "documents")
+
+    db = DocumentDatabase(config['SQLDB_DB_PATH'], pragmas_from_config(config), config.get("SQLITE_READ_CONNECTIONS", 4))
+    if config.get("VECTOR_BACKEND", "weaviate") == "local":
+        vector_client = LocalVdbClient.from_config(config)
+    else:
+        vector_client = VdbClient.from_config(config)
+
+    try:
+        if args.export_dir:
+            os.makedirs(args.export_dir, exist_ok=True)
+            export_documents_jsonl(db, os.path.join(args.export_dir, "documents.jsonl"), table_name)
+            export_vector_store_jsonl(vector_client, os.path.join(args.export_dir, "vectors.jsonl"), args.include_vectors)
+        else:
+            Reindexer.from_config(db, vector_client, config).run(restart=args.restart, recreate_collection=args.recreate)
+    finally:
+        vector_client.close()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+import logging
+import math
+import re
+from collections import Counter
+from typing import Iterable, List
+
+# Words of at least 3 letters, or 4-digit numbers such as years
+_TOKEN_PATTERN = re.compile(r"[^\W\d_]{3,}|\b\d{4}\b")
+
+PRUNED_TREE_NOTE = "(Only the directories most relevant to this document are shown.)"
+
+
+def tokenize(text: str) -> set:
+    """
+    Splits a text or a directory name into lowercase keywords.
+    CamelCase names are split into words, e.g. 'TaxReturns' -> {'tax', 'returns'}.
+    """
+    text = re.sub(r"([a-z])([A-Z])", r"\1 \2", text)
+    return {token.lower() for token in _TOKEN_PATTERN.findall(text)}
+
+
+def render_directory_tree(paths: Iterable[str]) -> str:
+    """
+    Renders relative directory paths in the same text format as generate_directory_tree.
+    Parents of the given paths are included automatically.
+
+    Args:
+        paths (Iterable[str]): Relative, '/'-separated directory paths.
+
+    Returns:
+        str: A directory tree as a formatted string.
+    """
+    tree = {}
+    for path in paths:
+        node = tree
+        for part in path.split("/"):
+            node = node.setdefault(part, {})
+
+    return render_tree(tree)
+
+
+def render_tree(tree: dict) -> str:
+    """
+    Renders a nested dictionary of directory names ({name: {child: {...}}}) in the
+    same text format as generate_directory_tree.
+    """
+    lines = []
+
+    def render(node: dict, indent: str):
+        entries = sorted(node, key=lambda s: s.lower())
+        for i, entry in enumerate(entries):
+            last = i == len(entries) - 1
+            lines.append(f"{indent}{'└── ' if last else '├── '}{entry}")
+            render(node[entry], indent + ("    " if last else "│   "))
+
+    render(tree, "")
+    return "\n".join(lines)
+
+
+class DirectoryTreeContext:
+    """
+    Builds the directory tree part of the structuring prompt. Instead of the whole
+    organised tree, it sends the top-level branches plus the subtrees whose names
+    share keywords with the beginning of the document (title and first page), within
+    a token budget.
+    """
+
+    def __init__(self, token_budget: int = 2000, query_chars: int = 3000):
+        """
+        :param token_budget: Maximum size of the rendered tree in tokens (4 characters per token).
+        :param query_chars: Number of characters from the start of the document used to find relevant directories.
+        """
+        self.token_budget = token_budget
+        self.query_chars = query_chars
+        self._budget_warned = False
+
+    def build(self, paths: List[str], document_text: str, full_tree: str = None) -> str:
+        """
+        Returns the pruned directory tree for a document.
+
+        :param paths: All relative directory paths of the organised tree.
+        :param document_text: Text of the document.
+        :param full_tree: The already rendered full tree, if available.
+        :return: str - The rendered tree; the full tree if it fits into the token budget.
+        """
+        full_tree = full_tree if full_tree is not None else render_directory_tree(paths)
+        if len(full_tree) / 4 <= self.token_budget:
+            return full_tree
+
+        children = {}
+        for path in paths:
+            parent, _, _ = path.rpartition("/")
+            children.setdefault(parent, []).append(path)
+
+        # The top-level branches are always kept, a smaller budget would leave only the note
+        top_level = sorted(children.get("", []), key=str.lower)
+        top_level_chars = sum(4 + len(path) + 1 for path in top_level)
+        budget_chars = self.token_budget * 4 - len(PRUNED_TREE_NOTE) - 1
+        if budget_chars < top_level_chars:
+            if not self._budget_warned:
+                self._budget_warned = True
+                logging.warning(
+                    f"DIR_TREE_TOKEN_BUDGET of {self.token_budget} tokens is too small for the top-level directories, "
+                    f"using {math.ceil((top_level_chars + len(PRUNED_TREE_NOTE) + 1) / 4)} tokens."
+                )
+            budget_chars = top_level_chars
+
+        selected = set()
+        used_chars = 0
+
+        def add(path: str) -> bool:
+            nonlocal used_chars
+            if path in selected:
+                return True
+            # Line length as rendered: 4 characters of indentation per level plus the connector
+            cost = 4 * path.count("/") + 4 + len(path.rpartition("/")[2]) + 1
+            if used_chars + cost > budget_chars:
+                return False
+            selected.add(path)
+            used_chars += cost
+            return True
+
+        # 1. Top-level branches, so the model sees the overall organisation
+        for path in top_level:
+            add(path)
+
+        # 2. Best matching directories with their ancestors and immediate subdirectories
+        for path in self.rank(paths, document_text[:self.query_chars]):
+            parts = path.split("/")
+            ancestors = ["/".join(parts[:i]) for i in range(1, len(parts) + 1)]
+            if not all(add(ancestor) for ancestor in ancestors):
+                break
+            for child in sorted(children.get(path, []), key=str.lower):
+                if not add(child):
+                    break
+
+        return render_directory_tree(selected) + "\n" + PRUNED_TREE_NOTE
+
+    @staticmethod
+    def rank(paths: List[str], query_text: str) -> List[str]:
+        """
+        Ranks directories by keyword similarity to the query text. Keywords that occur in
+        many directory names (e.g. years) count less than rare ones (IDF weighting), and
+        prefixes match so that 'invoice' also finds 'Invoices'.
+
+        :return: list - Paths with a positive score, best first.
+        """
+        query_tokens = tokenize(query_text)
+        if not query_tokens:
+            return []
+
+        name_tokens = {path: tokenize(path.rpartition("/")[2]) for path in paths}
+        document_frequency = Counter(token for tokens in name_tokens.values() for token in tokens)
+
+        def matches(name_token: str) -> bool:
+            if name_token in query_tokens:
+                return True
+            return len(name_token) >= 4 and any(
+                len(q) >= 4 and (q.startswith(name_token) or name_token.startswith(q)) for q in query_tokens
+            )
+
+        scores = {}
+        for path, tokens in name_tokens.items():
+            score = sum(math.log(1 + len(paths) / document_frequency[token]) for token in tokens if matches(token))
+            if score > 0:
+                scores[path] = score
+
+        # Deeper directories are more specific, prefer them on equal score
+        return sorted(scores, key=lambda path: (-scores[path], -path.count("/")))
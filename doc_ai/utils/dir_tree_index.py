@@ -0,0 +1,109 @@
+import logging
+import os
+import threading
+from typing import List
+from doc_ai.utils.dir_tree_context import render_tree
+
+
+class DirectoryTreeIndex:
+    """
+    In-memory index of the directories below a base path.
+
+    The tree is scanned once with os.scandir, then kept up to date by add_directory
+    whenever a directory is created (e.g. by move_file), so a new folder costs an
+    insert into a dictionary instead of another walk over the whole tree. The
+    rendered tree and the path list are cached until the next change.
+    """
+
+    def __init__(self, base_path: str):
+        """
+        :param base_path: Root of the directory tree, e.g. DIR_ORGANISED.
+        """
+        if not os.path.isdir(base_path):
+            raise ValueError(f"Invalid directory path: {base_path}")
+
+        self.base_path = os.path.abspath(base_path)
+        self._tree = {}
+        self._lock = threading.Lock()
+        self._rendered = None
+        self._paths = None
+        self.rebuild()
+
+    def rebuild(self):
+        """
+        Scans the whole tree again, e.g. after directories were changed outside of DocAI.
+        """
+        tree = {}
+        stack = [(self.base_path, tree)]
+        while stack:
+            directory, node = stack.pop()
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        # Skip hidden directories and files
+                        if entry.name.startswith(".") or not entry.is_dir():
+                            continue
+                        child = node[entry.name] = {}
+                        # List symlinked directories, but do not descend into them to avoid loops
+                        if not entry.is_symlink():
+                            stack.append((entry.path, child))
+            except OSError as e:
+                logging.error(f"Cannot scan directory '{directory}': {e}")
+
+        with self._lock:
+            self._tree = tree
+            self._invalidate()
+
+    def add_directory(self, path: str) -> bool:
+        """
+        Adds a directory (and any missing parents) to the index.
+
+        :param path: Absolute path, or path relative to the base path.
+        :return: bool - True if the index changed, False if the directory was already known
+            or lies outside the base path.
+        """
+        relative_path = os.path.relpath(os.path.abspath(os.path.join(self.base_path, path)), self.base_path)
+        if relative_path == "." or relative_path.startswith(".."):
+            return False
+
+        with self._lock:
+            node = self._tree
+            changed = False
+            for part in relative_path.split(os.sep):
+                if part not in node:
+                    node[part] = {}
+                    changed = True
+                node = node[part]
+            if changed:
+                self._invalidate()
+            return changed
+
+    def render(self) -> str:
+        """
+        Returns the tree in the text format of generate_directory_tree.
+        """
+        with self._lock:
+            if self._rendered is None:
+                self._rendered = render_tree(self._tree)
+            return self._rendered
+
+    def paths(self) -> List[str]:
+        """
+        Returns the relative, '/'-separated paths of all directories.
+        """
+        with self._lock:
+            if self._paths is None:
+                paths = []
+                stack = [("", self._tree)]
+                while stack:
+                    prefix, node = stack.pop()
+                    for name, child in node.items():
+                        path = f"{prefix}/{name}" if prefix else name
+                        paths.append(path)
+                        stack.append((path, child))
+                self._paths = paths
+            return self._paths
+
+    def _invalidate(self):
+        self._rendered = None
+        self._paths = None
@@ -4,6 +4,7 @@ import shutil
 import logging
 import json
 import datetime
+import hashlib
 from pathlib import Path
 
 ALL_LANGUAGES = {
@@ -134,6 +135,22 @@ def move_file(current_location: Path, new_location: str, new_document_filename:
     return new_dir_tree
 
 
+def compute_file_hash(file_path, algorithm: str = "sha256") -> str:
+    """
+    Computes the hash of a file's bytes, reading the file in chunks so that
+    large files are never loaded into memory at once.
+
+    Args:
+        file_path (str): The path to the file.
+        algorithm (str): Name of the hashlib algorithm to use (default: sha256).
+
+    Returns:
+        str: The hex digest of the file contents.
+    """
+    with open(file_path, "rb") as file:
+        return hashlib.file_digest(file, algorithm).hexdigest()
+
+
 def get_file_creation_time(file_path):
     """
     Get the creation timestamp of a file.
@@ -1,5 +1,73 @@
+from io import BytesIO
 from PIL import Image, ExifTags
-import os
+
+
+def compress_image_to_size(image_path, max_size_bytes, max_quality=95, min_quality=70, max_encodes=12) -> bytes:
+    """
+    Compresses an image in memory into a JPEG that is just under `max_size_bytes`.
+
+    The JPEG quality is binary searched first, at full resolution, down to `min_quality`.
+    Only if that is not enough is the scale binary searched as well, so text stays as
+    sharp as the byte budget allows. Each step is one in-memory encode; nothing is
+    written to disk and the original file is left untouched.
+
+    Args:
+        image_path (str): Path to the input image.
+        max_size_bytes (int): Maximum size of the encoded image in bytes.
+        max_quality (int): Highest JPEG quality to try (default: 95).
+        min_quality (int): Lowest JPEG quality to use before the image is scaled down (default: 70).
+        max_encodes (int): Upper bound on the number of encodes of each search.
+
+    Returns:
+        bytes: The JPEG image data.
+
+    Raises:
+        ValueError: If no encoding under `max_size_bytes` could be found.
+    """
+    with Image.open(image_path) as img:
+        img = correct_exif_orientation(img)
+        # Ensure the image uses RGB or keep the original mode for compatibility
+        img = img.convert("RGB") if img.mode != "RGB" else img
+        img.load()
+
+    data = _encode_jpeg(img, max_quality)
+    if len(data) <= max_size_bytes:
+        return data
+
+    # 1. Find the highest quality that fits at full resolution
+    best = None
+    low, high = min_quality, max_quality - 1
+    for _ in range(max_encodes):
+        if low > high:
+            break
+        quality = (low + high) // 2
+        data = _encode_jpeg(img, quality)
+        if len(data) <= max_size_bytes:
+            best, low = data, quality + 1
+        else:
+            high = quality - 1
+    if best is not None:
+        return best
+
+    # 2. Find the largest scale that fits at the lowest quality. JPEG size grows roughly
+    # with the pixel count, which gives a good first guess for the search.
+    size_at_min_quality = len(_encode_jpeg(img, min_quality))
+    low, high = 0.0, 1.0
+    scale = min(0.99, (max_size_bytes / size_at_min_quality) ** 0.5)
+    for _ in range(max_encodes):
+        data = _encode_jpeg(_scale_image(img, scale), min_quality)
+        if len(data) <= max_size_bytes:
+            best, low = data, scale
+            # Stop once the result uses most of the budget
+            if len(data) >= 0.9 * max_size_bytes:
+                break
+        else:
+            high = scale
+        scale = (low + high) / 2
+
+    if best is None:
+        raise ValueError(f"Could not compress '{image_path}' under {max_size_bytes} bytes.")
+    return best
 
 
 def resize_image_to_size(image_path, output_path, max_size_mb=5):
@@ -17,32 +85,26 @@ def resize_image_to_size(image_path, output_path, max_size_mb=5):
     max_size_bytes = max_size_mb * 1024 * 1024  # Convert MB to bytes
 
     try:
-        with Image.open(image_path) as img:
-            img = correct_exif_orientation(img)
-            # Ensure the image uses RGB or keep the original mode for compatibility
-            img = img.convert("RGB") if img.mode != "RGB" else img
-
-            # Initial save with high quality
-            img.save(output_path, "JPEG", quality=95)
+        data = compress_image_to_size(image_path, max_size_bytes)
+        with open(output_path, "wb") as output_file:
+            output_file.write(data)
+        return True
 
-            # Check the initial size
-            while os.path.getsize(output_path) > max_size_bytes:
-                # Calculate scaling factor
-                scaling_factor = (max_size_bytes / os.path.getsize(output_path)) ** 0.5
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        return False
 
-                # New dimensions
-                new_width = int(img.width * scaling_factor)
-                new_height = int(img.height * scaling_factor)
 
-                # Resize and save with lower quality incrementally
-                img = img.resize((new_width, new_height), Image.LANCZOS)
-                img.save(output_path, "JPEG", quality=85)  # Adjust quality
+def _encode_jpeg(img, quality) -> bytes:
+    buffer = BytesIO()
+    img.save(buffer, "JPEG", quality=quality)
+    return buffer.getvalue()
 
-            return True
 
-    except Exception as e:
-        print(f"An error occurred: {e}")
-        return False
+def _scale_image(img, scale):
+    # High-quality LANCZOS resizing keeps scanned text legible
+    new_size = (max(1, int(img.width * scale)), max(1, int(img.height * scale)))
+    return img.resize(new_size, Image.LANCZOS)
 
 def correct_exif_orientation(img):
     """
@@ -0,0 +1,118 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+from typing import Iterator, NamedTuple
+
+# ------------------------------------------------------------------------
+# Linux inotify
+# ------------------------------------------------------------------------
+# Minimal ctypes binding of inotify(7), so watch mode needs no extra dependency.
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class InotifyEvent(NamedTuple):
+    wd: int
+    mask: int
+    cookie: int
+    name: str
+
+
+class Inotify:
+    """
+    An inotify instance. Directories are watched with add_watch, and the queued
+    events are returned by read_events.
+    """
+
+    def __init__(self):
+        libc_name = ctypes.util.find_library("c")
+        try:
+            self._libc = ctypes.CDLL(libc_name or "libc.so.6", use_errno=True)
+            self._libc.inotify_init1
+        except (OSError, AttributeError) as e:
+            raise OSError("inotify is not available on this platform (Linux only).") from e
+
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            self._raise_errno("inotify_init1")
+
+    def add_watch(self, path: str, mask: int) -> int:
+        """
+        Watches a path for the events in `mask`.
+
+        Args:
+            path (str): File or directory to watch.
+            mask (int): Bitwise OR of the IN_* event constants.
+
+        Returns:
+            int: The watch descriptor, reported as `wd` in the events of this path.
+        """
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), ctypes.c_uint32(mask))
+        if wd < 0:
+            self._raise_errno(f"inotify_add_watch '{path}'")
+        return wd
+
+    def rm_watch(self, wd: int):
+        # Fails if the kernel already removed the watch (e.g. the directory was deleted)
+        self._libc.inotify_rm_watch(self.fd, wd)
+
+    def read_events(self, timeout: float = None) -> Iterator[InotifyEvent]:
+        """
+        Waits up to `timeout` seconds for events and yields all events that are queued.
+
+        Args:
+            timeout (float): Seconds to wait, or None to wait until an event arrives.
+
+        Yields:
+            InotifyEvent: The events, in the order they were queued.
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return
+
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return
+
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            yield InotifyEvent(wd, mask, cookie, os.fsdecode(name))
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @staticmethod
+    def _raise_errno(call: str):
+        errno = ctypes.get_errno()
+        raise OSError(errno, f"{call} failed: {os.strerror(errno)}")
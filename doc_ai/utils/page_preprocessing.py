@@ -0,0 +1,196 @@
+from io import BytesIO
+import numpy as np
+from PIL import Image
+
+# ------------------------------------------------------------------------
+# Page Preprocessing
+# ------------------------------------------------------------------------
+# Shared by the PDF rasterization (pdf_to_img) and the OCR fallback (ocr).
+# Pages are handled as 2D uint8 NumPy arrays (0 = black, 255 = white), so every
+# step is a vectorized array operation instead of a per-pixel Python callback.
+
+THRESHOLD_METHODS = ("global", "adaptive", "otsu")
+
+
+def to_gray_array(page) -> np.ndarray:
+    """
+    Converts a PIL image or a NumPy array (grayscale, RGB or BGR) into a 2D uint8 grayscale array.
+
+    Args:
+        page (Image.Image | np.ndarray): The page to convert.
+
+    Returns:
+        np.ndarray: Grayscale page.
+    """
+    if isinstance(page, Image.Image):
+        return np.asarray(page.convert("L"))
+
+    page = np.asarray(page)
+    if page.ndim == 2:
+        return page.astype(np.uint8, copy=False)
+    # Channel order does not matter much for text pages, use the plain mean of the colour channels
+    return page[..., :3].mean(axis=2).astype(np.uint8)
+
+
+def global_threshold(gray: np.ndarray, threshold: int = 128, invert: bool = False) -> np.ndarray:
+    """
+    Binarizes a page with a single threshold: pixels below `threshold` become black.
+
+    Args:
+        gray (np.ndarray): Grayscale page.
+        threshold (int): Threshold value (default: 128).
+        invert (bool): Return white text on black background.
+
+    Returns:
+        np.ndarray: Binary page with values 0 and 255.
+    """
+    foreground = gray < threshold if invert else gray >= threshold
+    return foreground.astype(np.uint8) * 255
+
+
+def otsu_threshold_value(gray: np.ndarray) -> int:
+    """
+    Computes Otsu's threshold, the value that maximises the between-class variance
+    of the page histogram.
+
+    Args:
+        gray (np.ndarray): Grayscale page.
+
+    Returns:
+        int: Threshold value.
+    """
+    hist = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    weight = np.cumsum(hist)
+    mean = np.cumsum(hist * np.arange(256))
+    total, total_mean = weight[-1], mean[-1]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        variance = (total_mean * weight - mean * total) ** 2 / (weight * (total - weight))
+
+    return int(np.argmax(np.nan_to_num(variance)))
+
+
+def otsu_threshold(gray: np.ndarray, invert: bool = False) -> np.ndarray:
+    """
+    Binarizes a page with Otsu's threshold. Pixels above the threshold become white
+    (black if `invert` is set), matching cv2.THRESH_OTSU.
+    """
+    return global_threshold(gray, otsu_threshold_value(gray) + 1, invert=invert)
+
+
+def adaptive_threshold(gray: np.ndarray, block_size: int = 31, offset: int = 10, invert: bool = False) -> np.ndarray:
+    """
+    Binarizes a page against the mean of each pixel's `block_size` neighbourhood,
+    which copes with uneven lighting and shadows on scans. The local means are
+    computed for all pixels at once from an integral image.
+
+    Args:
+        gray (np.ndarray): Grayscale page.
+        block_size (int): Size of the neighbourhood (made odd if needed).
+        offset (int): A pixel is black if it is more than `offset` darker than its local mean.
+        invert (bool): Return white text on black background.
+
+    Returns:
+        np.ndarray: Binary page with values 0 and 255.
+    """
+    block_size = block_size + 1 if block_size % 2 == 0 else block_size
+    radius = block_size // 2
+    height, width = gray.shape
+
+    padded = np.pad(gray, radius, mode="edge")
+    integral = np.zeros((height + 2 * radius + 1, width + 2 * radius + 1), dtype=np.int64)
+    integral[1:, 1:] = padded.cumsum(axis=0, dtype=np.int64).cumsum(axis=1)
+
+    window_sums = (
+        integral[block_size:, block_size:]
+        - integral[:-block_size, block_size:]
+        - integral[block_size:, :-block_size]
+        + integral[:-block_size, :-block_size]
+    )
+    # Compare sums instead of means to stay in integer arithmetic
+    foreground = gray.astype(np.int64) * (block_size * block_size) > window_sums - offset * block_size * block_size
+    if invert:
+        foreground = ~foreground
+    return foreground.astype(np.uint8) * 255
+
+
+def threshold(gray: np.ndarray, method: str = "global", **kwargs) -> np.ndarray:
+    """
+    Binarizes a page with one of THRESHOLD_METHODS. Extra keyword arguments are
+    passed to the thresholding function.
+    """
+    if method == "global":
+        return global_threshold(gray, **kwargs)
+    if method == "adaptive":
+        return adaptive_threshold(gray, **kwargs)
+    if method == "otsu":
+        return otsu_threshold(gray, **kwargs)
+    raise ValueError(f"Unknown threshold method '{method}'. Use one of {THRESHOLD_METHODS}.")
+
+
+def downsample_to_dpi(gray: np.ndarray, source_dpi: int, target_dpi: int) -> np.ndarray:
+    """
+    Scales a page rendered at `source_dpi` down to `target_dpi`. Pages that are
+    already at or below the target resolution are returned unchanged.
+    """
+    if not target_dpi or not source_dpi or target_dpi >= source_dpi:
+        return gray
+
+    scale = target_dpi / source_dpi
+    height, width = gray.shape
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    return np.asarray(Image.fromarray(gray).resize(size, Image.BOX))
+
+
+def encode_png(page: np.ndarray, compress_level: int = 1, binary: bool = None) -> bytes:
+    """
+    Encodes a page as PNG. Binary pages (only 0 and 255) are stored as 1-bit images.
+    A low `compress_level` trades a slightly larger file for much faster encoding.
+    Pass `binary` when it is known to skip checking the pixel values.
+    """
+    if binary is None:
+        binary = page.dtype == np.bool_ or _is_binary(page)
+
+    if page.dtype == np.bool_:
+        image = Image.fromarray(page)
+    elif binary:
+        image = Image.fromarray(page > 127)
+    else:
+        image = Image.fromarray(page)
+
+    buffer = BytesIO()
+    image.save(buffer, format="PNG", compress_level=compress_level)
+    return buffer.getvalue()
+
+
+def encode_jpeg(page: np.ndarray, quality: int = 85) -> bytes:
+    """
+    Encodes a grayscale page as JPEG without optimisation passes.
+    """
+    buffer = BytesIO()
+    Image.fromarray(page).save(buffer, format="JPEG", quality=quality, optimize=False)
+    return buffer.getvalue()
+
+
+def preprocess_page(page, method: str = "global", source_dpi: int = None, target_dpi: int = None,
+                    **threshold_kwargs) -> np.ndarray:
+    """
+    Runs the full preprocessing of a page: grayscale conversion, optional downsampling
+    to `target_dpi` and thresholding.
+
+    Args:
+        page (Image.Image | np.ndarray): The page.
+        method (str): One of THRESHOLD_METHODS.
+        source_dpi (int): Resolution the page was rendered at.
+        target_dpi (int): Resolution to downsample to, or None to keep the page size.
+
+    Returns:
+        np.ndarray: Binary page with values 0 and 255.
+    """
+    gray = to_gray_array(page)
+    gray = downsample_to_dpi(gray, source_dpi, target_dpi)
+    return threshold(gray, method, **threshold_kwargs)
+
+
+def _is_binary(page: np.ndarray) -> bool:
+    return page.ndim == 2 and not np.any((page != 0) & (page != 255))
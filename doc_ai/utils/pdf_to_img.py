@@ -1,31 +1,78 @@
-from io import BytesIO
-from pdf2image import convert_from_path
+import tempfile
+import numpy as np
+from pdf2image import convert_from_path, pdfinfo_from_path
 from PIL import Image
+from doc_ai.utils.page_preprocessing import preprocess_page, encode_png
 
-def pdf_to_page_imgs(file_path: str) -> list:
-    # Convert PDF to a list of PIL Image objects, one for each page
-    images_of_pages = convert_from_path(file_path)
 
-    # Initialize a list to store the binary images
-    image_bytes_list = []
+def binarize_page(page: Image.Image, method: str = "global", source_dpi: int = None, target_dpi: int = None) -> bytes:
+    """
+    Converts a rendered page into a binary (black and white) PNG image.
 
-    # Save each page as an image file
-    for page_num, page in enumerate(images_of_pages, 1):
-        # Convert the page to grayscale first
-        gray_image = page.convert('L')  # 'L' mode means grayscale
+    Args:
+        page (Image.Image): The rendered page.
+        method (str): Thresholding method, see page_preprocessing.THRESHOLD_METHODS.
+        source_dpi (int): Resolution the page was rendered at.
+        target_dpi (int): Resolution to downsample the page to before thresholding, or None.
 
-        # Apply a binary threshold to the grayscale image
-        image_binary = gray_image.point(lambda x: 0 if x < 128 else 255, '1')  # Convert to binary (1-bit pixels)
-        # Convert the `Image` object into a bytes-like object using BytesIO
-        image_buffer = BytesIO()
-        image_binary.save(image_buffer, format='PNG')  # Save the image in PNG format (or other desired format)
-        image_buffer.seek(0)  # Move to the start of the BytesIO buffer
+    Returns:
+        bytes: Binary data of the page in PNG format.
+    """
+    return encode_png(preprocess_page(page, method, source_dpi=source_dpi, target_dpi=target_dpi), binary=True)
 
-        # Append to the list
-        image_bytes_list.append(image_buffer.getvalue())
 
-    # Return the list of binary images
-    return image_bytes_list
+def iter_pdf_page_imgs(file_path: str, dpi: int = 200, thread_count: int = 1, pages_per_batch: int = None,
+                       use_output_folder: bool = True, threshold_method: str = "global", target_dpi: int = None):
+    """
+    Renders a PDF page range at a time and yields each page as a binary PNG image
+    as soon as it is ready, so peak memory stays at about one batch of pages no
+    matter how long the document is.
+
+    Args:
+        file_path (str): The path to the PDF file.
+        dpi (int): Rendering resolution (default: 200).
+        thread_count (int): Number of pdftoppm processes rendering a batch in parallel.
+        pages_per_batch (int): Number of pages rendered per pdftoppm call. Defaults to `thread_count`.
+        use_output_folder (bool): Let pdftoppm write the pages to a temporary folder and load them one
+            by one, instead of piping every page of the batch into memory.
+        threshold_method (str): Thresholding method, see page_preprocessing.THRESHOLD_METHODS.
+        target_dpi (int): Resolution to downsample the pages to before thresholding, or None.
+
+    Yields:
+        bytes: Binary data of each page in PNG format, in page order.
+    """
+    page_count = pdfinfo_from_path(file_path)["Pages"]
+    pages_per_batch = pages_per_batch or thread_count
+    preprocessing = dict(method=threshold_method, source_dpi=dpi, target_dpi=target_dpi)
+
+    for first_page in range(1, page_count + 1, pages_per_batch):
+        last_page = min(first_page + pages_per_batch - 1, page_count)
+        options = dict(dpi=dpi, first_page=first_page, last_page=last_page, thread_count=thread_count)
+
+        if use_output_folder:
+            with tempfile.TemporaryDirectory() as output_folder:
+                page_paths = convert_from_path(file_path, output_folder=output_folder, paths_only=True, **options)
+                for page_path in page_paths:
+                    with Image.open(page_path) as page:
+                        yield binarize_page(page, **preprocessing)
+        else:
+            for page in convert_from_path(file_path, **options):
+                yield binarize_page(page, **preprocessing)
+
+
+def pdf_to_page_imgs(file_path: str, dpi: int = 200) -> list:
+    """
+    Converts each page of a PDF into a binary (black and white) PNG image.
+    Use `iter_pdf_page_imgs` to process long documents page by page.
+
+    Args:
+        file_path (str): The path to the PDF file.
+        dpi (int): Rendering resolution (default: 200).
+
+    Returns:
+        list: Binary data of each page in PNG format.
+    """
+    return list(iter_pdf_page_imgs(file_path, dpi=dpi))
 
 def pdf_to_combined_img(file_path: str):
     """
@@ -49,38 +96,15 @@ def pdf_to_combined_img(file_path: str):
     # Convert PDF to a list of PIL Image objects, one per page
     images_of_pages = convert_from_path(file_path)
 
-    # Convert each page to grayscale and binary, and gather dimensions
-    processed_images = []
-    total_height = 0
-    max_width = 0
-
-    for page in images_of_pages:
-        # Convert the page to grayscale
-        gray_image = page.convert('L')  # 'L' mode means grayscale
-
-        # Apply binary threshold
-        image_binary = gray_image.point(lambda x: 0 if x < 128 else 255, '1')  # Binary image
-
-        # Collect processed image
-        processed_images.append(image_binary)
-
-        # Update total height and maximum width
-        total_height += image_binary.height
-        max_width = max(max_width, image_binary.width)
-
-    # Create a blank "tall" image with combined dimensions
-    combined_image = Image.new("1", (max_width, total_height), color=1)  # '1' mode for binary, default white
-
-    # Paste each binary image onto the tall image
-    current_y = 0
-    for image in processed_images:
-        combined_image.paste(image, (0, current_y))
-        current_y += image.height
+    # Convert each page to grayscale and binary
+    processed_pages = [preprocess_page(page) for page in images_of_pages]
+    max_width = max(page.shape[1] for page in processed_pages)
 
-    # Convert the combined image to binary data
-    image_buffer = BytesIO()
-    combined_image.save(image_buffer, format='PNG')  # Save as PNG
-    image_buffer.seek(0)
+    # Pad narrower pages with white on the right and stack them vertically
+    combined_image = np.vstack([
+        np.pad(page, ((0, 0), (0, max_width - page.shape[1])), constant_values=255)
+        for page in processed_pages
+    ])
 
-    # Return the binary image data
-    return image_buffer.getvalue()
\ No newline at end of file
+    # Return the binary image data in PNG format
+    return encode_png(combined_image, binary=True)
@@ -0,0 +1,85 @@
+from typing import List
+
+# Boundaries to split on, from the strongest to the weakest:
+# page breaks, paragraphs (PDF pages are also joined with blank lines), lines and words.
+SEPARATORS = ("\f", "\n\n", "\n", " ")
+
+
+def split_text(text: str, max_chars: int, separators=SEPARATORS) -> List[str]:
+    """
+    Splits a text into chunks of at most `max_chars` characters, cutting on the
+    strongest boundary possible. Neighbouring pieces are packed together as long as
+    they fit, so chunks stay close to `max_chars` and keep their natural order.
+
+    Args:
+        text (str): The text to split.
+        max_chars (int): Maximum length of a chunk.
+        separators (tuple): Boundaries to split on, strongest first. Text that contains
+            none of them is cut at `max_chars`.
+
+    Returns:
+        list: The chunks, in document order.
+    """
+    if max_chars < 1:
+        raise ValueError("max_chars must be at least 1.")
+    if len(text) <= max_chars:
+        return [text] if text.strip() else []
+
+    separator = next((sep for sep in separators if sep in text), None)
+    if separator is None:
+        return [text[i:i + max_chars] for i in range(0, len(text), max_chars)]
+
+    weaker_separators = separators[separators.index(separator) + 1:]
+    chunks = []
+    current = ""
+    for piece in text.split(separator):
+        candidate = f"{current}{separator}{piece}" if current else piece
+        if len(candidate) <= max_chars:
+            current = candidate
+            continue
+
+        if current.strip():
+            chunks.append(current)
+        if len(piece) <= max_chars:
+            current = piece
+        else:
+            # The piece alone is too long, split it on a weaker boundary
+            chunks.extend(split_text(piece, max_chars, weaker_separators))
+            current = ""
+
+    if current.strip():
+        chunks.append(current)
+    return chunks
+
+
+def split_passages(text: str, max_chars: int, overlap_chars: int = 0) -> List[str]:
+    """
+    Splits a text into passages for embedding. Like split_text, but every passage
+    after the first starts with the last `overlap_chars` characters of the previous
+    one (cut at a word boundary), so a sentence that straddles a boundary is complete
+    in at least one passage.
+
+    Args:
+        text (str): The text to split.
+        max_chars (int): Maximum length of a passage, including the overlap.
+        overlap_chars (int): Length of the text repeated from the previous passage.
+
+    Returns:
+        list: The passages, in document order.
+    """
+    if not 0 <= overlap_chars < max_chars:
+        raise ValueError("overlap_chars must be at least 0 and smaller than max_chars.")
+
+    chunks = split_text(text, max_chars - overlap_chars)
+    if not overlap_chars:
+        return chunks
+
+    passages = chunks[:1]
+    for previous, chunk in zip(chunks, chunks[1:]):
+        # One character less than overlap_chars, which leaves room for the joining space
+        overlap = previous[max(0, len(previous) - overlap_chars + 1):]
+        # Do not start the passage in the middle of a word
+        if len(overlap) < len(previous) and " " in overlap:
+            overlap = overlap[overlap.index(" ") + 1:]
+        passages.append(f"{overlap} {chunk}" if overlap else chunk)
+    return passages